@@ -0,0 +1,475 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Sequence, Tuple
+
+import aiosqlite
+import zstandard
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.checkpoint.serde.base import SerializerProtocol
+from langgraph.checkpoint.serde.jsonplus import JsonPlusSerializer
+
+# which checkpointer the agents use, see create_checkpointer; persisting conversations is opt-in
+CHECKPOINT_BACKEND = os.environ.get("CHECKPOINT_BACKEND", "memory")
+CHECKPOINT_DB = os.environ.get("CHECKPOINT_DB", "checkpoints.sqlite")
+CHECKPOINT_COMPRESSION = os.environ.get("CHECKPOINT_COMPRESSION", "zstd")
+# threads untouched for this long are deleted
+CHECKPOINT_TTL = float(os.environ.get("CHECKPOINT_TTL", 7 * 24 * 3600))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS blobs (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    channel TEXT NOT NULL,
+    version TEXT NOT NULL,
+    type TEXT NOT NULL,
+    blob BLOB,
+    PRIMARY KEY (thread_id, checkpoint_ns, channel, version)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS threads_updated_at ON threads (updated_at);
+"""
+
+
+class CompressedSerializer:
+    """
+    Serializes like LangGraph's default serializer (msgpack via ormsgpack) and
+    compresses anything larger than `min_size` bytes with zstandard.
+
+    Compressed values are tagged "zstd+<type>", so uncompressed values written
+    earlier still load.
+    """
+    PREFIX = "zstd+"
+
+    def __init__(self, serde: Optional[SerializerProtocol] = None, level: int = 3, min_size: int = 512):
+        self.serde = serde or JsonPlusSerializer()
+        self.min_size = min_size
+        self.compressor = zstandard.ZstdCompressor(level=level)
+        self.decompressor = zstandard.ZstdDecompressor()
+
+    def dumps_typed(self, obj: Any) -> Tuple[str, bytes]:
+        type_, data = self.serde.dumps_typed(obj)
+        if len(data) < self.min_size:
+            return type_, data
+        return self.PREFIX + type_, self.compressor.compress(data)
+
+    def loads_typed(self, data: Tuple[str, bytes]) -> Any:
+        type_, payload = data
+        if type_.startswith(self.PREFIX):
+            return self.serde.loads_typed((type_[len(self.PREFIX):], self.decompressor.decompress(payload)))
+        return self.serde.loads_typed((type_, payload))
+
+
+class SQLiteCheckpointer(BaseCheckpointSaver[str]):
+    """
+    Async LangGraph checkpointer backed by an on-disk SQLite database (through aiosqlite).
+
+    Like MemorySaver, each channel value is stored once per version, so a checkpoint
+    only writes the channels that changed in that step. Every write also records when
+    its thread was last used, and threads idle for longer than `ttl` seconds are
+    deleted, at most once every `prune_interval` seconds.
+
+    Args:
+        path: Database file
+        serde: Serializer, e.g. a CompressedSerializer
+        ttl: Seconds after which an idle thread is pruned (None keeps threads forever)
+        prune_interval: Minimum seconds between two automatic prunes
+    """
+    def __init__(self, path: str, *, serde: Optional[SerializerProtocol] = None,
+                 ttl: Optional[float] = None, prune_interval: float = 600):
+        super().__init__(serde=serde)
+        self.path = path
+        self.ttl = ttl
+        self.prune_interval = prune_interval
+        self.last_pruned = 0.0
+        self.conn: Optional[aiosqlite.Connection] = None
+
+    async def setup(self):
+        if self.conn is not None:
+            return
+        self.conn = await aiosqlite.connect(self.path)
+        # WAL lets readers proceed while a checkpoint is written; NORMAL sync is
+        # durable across application crashes, which is what conversation state needs
+        await self.conn.execute("PRAGMA journal_mode=WAL")
+        await self.conn.execute("PRAGMA synchronous=NORMAL")
+        await self.conn.executescript(SCHEMA)
+        await self.conn.commit()
+
+    async def close(self):
+        if self.conn is not None:
+            await self.conn.close()
+            self.conn = None
+
+    async def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        if not versions:
+            return {}
+        channel_values = {}
+        for channel, version in versions.items():
+            async with self.conn.execute(
+                "SELECT type, blob FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+                (thread_id, checkpoint_ns, channel, str(version)),
+            ) as cursor:
+                row = await cursor.fetchone()
+            if row is not None and row[0] != "empty":
+                channel_values[channel] = self.serde.loads_typed((row[0], row[1]))
+        return channel_values
+
+    async def _to_tuple(self, thread_id: str, checkpoint_ns: str, row) -> CheckpointTuple:
+        checkpoint_id, parent_checkpoint_id, type_, checkpoint, metadata_type, metadata = row
+        checkpoint_ = self.serde.loads_typed((type_, checkpoint))
+
+        async with self.conn.execute(
+            "SELECT task_id, channel, type, value FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+            (thread_id, checkpoint_ns, checkpoint_id),
+        ) as cursor:
+            writes = await cursor.fetchall()
+
+        return CheckpointTuple(
+            config={
+                "configurable": {
+                    "thread_id": thread_id,
+                    "checkpoint_ns": checkpoint_ns,
+                    "checkpoint_id": checkpoint_id,
+                }
+            },
+            checkpoint={
+                **checkpoint_,
+                "channel_values": await self._load_blobs(thread_id, checkpoint_ns, checkpoint_["channel_versions"]),
+            },
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            pending_writes=[
+                (task_id, channel, self.serde.loads_typed((value_type, value)))
+                for task_id, channel, value_type, value in writes
+            ],
+            parent_config=(
+                {
+                    "configurable": {
+                        "thread_id": thread_id,
+                        "checkpoint_ns": checkpoint_ns,
+                        "checkpoint_id": parent_checkpoint_id,
+                    }
+                }
+                if parent_checkpoint_id
+                else None
+            ),
+        )
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        await self.setup()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = "checkpoint_id, parent_checkpoint_id, type, checkpoint, metadata_type, metadata"
+
+        if checkpoint_id := get_checkpoint_id(config):
+            query = (f"SELECT {columns} FROM checkpoints "
+                     "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?")
+            params = (thread_id, checkpoint_ns, checkpoint_id)
+        else:
+            # checkpoint ids are time ordered, the largest one is the latest
+            query = (f"SELECT {columns} FROM checkpoints "
+                     "WHERE thread_id = ? AND checkpoint_ns = ? ORDER BY checkpoint_id DESC LIMIT 1")
+            params = (thread_id, checkpoint_ns)
+
+        async with self.conn.execute(query, params) as cursor:
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        return await self._to_tuple(thread_id, checkpoint_ns, row)
+
+    async def alist(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> AsyncIterator[CheckpointTuple]:
+        await self.setup()
+        clauses, params = [], []
+        if config is not None:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before is not None and (before_id := get_checkpoint_id(before)):
+            clauses.append("checkpoint_id < ?")
+            params.append(before_id)
+
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        async with self.conn.execute(
+            "SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+            f"metadata_type, metadata FROM checkpoints {where} ORDER BY checkpoint_id DESC",
+            params,
+        ) as cursor:
+            rows = await cursor.fetchall()
+
+        yielded = 0
+        for thread_id, checkpoint_ns, *row in rows:
+            checkpoint_tuple = await self._to_tuple(thread_id, checkpoint_ns, row)
+            if filter and any(checkpoint_tuple.metadata.get(k) != v for k, v in filter.items()):
+                continue
+            yield checkpoint_tuple
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                break
+
+    async def aput(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        await self.setup()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"]["checkpoint_ns"]
+
+        c = checkpoint.copy()
+        values: Dict[str, Any] = c.pop("channel_values")
+        blobs = []
+        for channel, version in new_versions.items():
+            type_, blob = self.serde.dumps_typed(values[channel]) if channel in values else ("empty", b"")
+            blobs.append((thread_id, checkpoint_ns, channel, str(version), type_, blob))
+
+        type_, serialized_checkpoint = self.serde.dumps_typed(c)
+        metadata_type, serialized_metadata = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+
+        await self.conn.executemany("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, ?, ?)", blobs)
+        await self.conn.execute(
+            "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+             type_, serialized_checkpoint, metadata_type, serialized_metadata),
+        )
+        await self.conn.execute("INSERT OR REPLACE INTO threads VALUES (?, ?)", (thread_id, time.time()))
+        await self.conn.commit()
+
+        if self.ttl is not None and time.monotonic() - self.last_pruned > self.prune_interval:
+            await self.prune(self.ttl)
+
+        return {
+            "configurable": {
+                "thread_id": thread_id,
+                "checkpoint_ns": checkpoint_ns,
+                "checkpoint_id": checkpoint["id"],
+            }
+        }
+
+    async def aput_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        await self.setup()
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+
+        rows = []
+        for idx, (channel, value) in enumerate(writes):
+            type_, blob = self.serde.dumps_typed(value)
+            rows.append((thread_id, checkpoint_ns, checkpoint_id, task_id,
+                         WRITES_IDX_MAP.get(channel, idx), channel, type_, blob, task_path))
+
+        # regular writes are kept from the first attempt, special writes (errors, interrupts) are replaced
+        if all(channel in WRITES_IDX_MAP for channel, _ in writes):
+            statement = "INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        else:
+            statement = "INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+        await self.conn.executemany(statement, rows)
+        await self.conn.commit()
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await self.setup()
+        for table in ("checkpoints", "blobs", "writes", "threads"):
+            await self.conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+        await self.conn.commit()
+
+    async def prune(self, ttl: float) -> int:
+        """
+        Deletes every thread that has not been written to for `ttl` seconds.
+
+        Returns:
+            The number of threads deleted
+        """
+        await self.setup()
+        self.last_pruned = time.monotonic()
+        async with self.conn.execute(
+            "SELECT thread_id FROM threads WHERE updated_at < ?", (time.time() - ttl,)
+        ) as cursor:
+            expired = [thread_id for (thread_id,) in await cursor.fetchall()]
+        for thread_id in expired:
+            await self.adelete_thread(thread_id)
+        return len(expired)
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        # the same zero-padded string versions as MemorySaver, so they sort correctly as text
+        return MemorySaver.get_next_version(self, current, channel)
+
+
+async def create_checkpointer(backend: str = CHECKPOINT_BACKEND, path: str = CHECKPOINT_DB,
+                              compression: str = CHECKPOINT_COMPRESSION, ttl: Optional[float] = CHECKPOINT_TTL):
+    """
+    Creates the checkpointer the agents share, configured through environment variables:
+        CHECKPOINT_BACKEND      "memory" (default) forgets conversations on exit, "sqlite" keeps them across restarts
+        CHECKPOINT_DB           SQLite database file (checkpoints.sqlite)
+        CHECKPOINT_COMPRESSION  "zstd" (default) or "none"
+        CHECKPOINT_TTL          seconds after which idle threads are pruned (one week)
+
+    Usage:
+        checkpointer = await create_checkpointer()
+        agent = graph.compile(checkpointer=checkpointer)
+        ...
+        await close_checkpointer(checkpointer)
+    """
+    if backend == "memory":
+        return MemorySaver()
+
+    serde = CompressedSerializer() if compression == "zstd" else None
+    checkpointer = SQLiteCheckpointer(path, serde=serde, ttl=ttl)
+    await checkpointer.setup()
+    # drop expired threads straight away instead of waiting for the first write
+    if ttl is not None:
+        pruned = await checkpointer.prune(ttl)
+        if pruned:
+            print(f"[checkpoints] pruned {pruned} threads idle for more than {ttl / 3600:.0f}h")
+    return checkpointer
+
+
+async def close_checkpointer(checkpointer):
+    """Closes the database connection of an on-disk checkpointer, if any"""
+    if isinstance(checkpointer, SQLiteCheckpointer):
+        await checkpointer.close()
+
+
+async def benchmark(turns: int = 50, path: str = "checkpoint_benchmark.sqlite"):
+    """
+    Runs the same conversation through a small agent graph with each checkpointer and
+    reports the per-turn latency of the turn itself (which writes the checkpoints) and
+    of reading the latest state back, plus the database size.
+    """
+    from langchain_core.messages import AIMessage, ToolMessage
+    from langgraph.graph import StateGraph, START, END
+    from langgraph.graph.message import AnyMessage, add_messages
+    from typing import Annotated, List
+    from typing_extensions import TypedDict
+
+    class State(TypedDict):
+        messages: Annotated[List[AnyMessage], add_messages]
+
+    # a tool call plus a tool output and an answer, roughly the shape of a real turn
+    def agent_node(state: State) -> State:
+        turn = len(state["messages"])
+        return {"messages": [
+            AIMessage("", tool_calls=[{"name": "search", "args": {"query": f"topic {turn}"}, "id": f"call-{turn}"}]),
+            ToolMessage("Article text about the topic. " * 60, tool_call_id=f"call-{turn}"),
+            AIMessage("Here is what I found about the topic. " * 15),
+        ]}
+
+    graph = StateGraph(State)
+    graph.add_node("agent", agent_node)
+    graph.add_edge(START, "agent")
+    graph.add_edge("agent", END)
+
+    def report(timings):
+        timings = sorted(timings)
+        return f"{1000 * statistics.mean(timings):7.2f} ms (p95 {1000 * timings[int(0.95 * (len(timings) - 1))]:6.2f})"
+
+    print(f"\nCheckpointer benchmark ({turns} turns, one thread)")
+    print("---"*30)
+    print(f"{'checkpointer':<22}{'turn (writes)':>28}{'read latest':>28}{'size':>10}")
+
+    for label, compression, backend in [("MemorySaver", None, "memory"),
+                                        ("SQLite", "none", "sqlite"),
+                                        ("SQLite + zstd", "zstd", "sqlite")]:
+        for suffix in ("", "-wal", "-shm"):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+
+        checkpointer = await create_checkpointer(backend, path, compression or "none", ttl=None)
+        agent = graph.compile(checkpointer=checkpointer)
+        config = {"configurable": {"thread_id": "benchmark"}}
+        turn_timings, read_timings = [], []
+        for turn in range(turns):
+            start = time.perf_counter()
+            await agent.ainvoke({"messages": [("user", f"tell me about topic {turn}")]}, config)
+            turn_timings.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            await checkpointer.aget_tuple(config)
+            read_timings.append(time.perf_counter() - start)
+        await close_checkpointer(checkpointer)
+
+        size = "-"
+        if backend != "memory":
+            size_bytes = sum(os.path.getsize(path + suffix) for suffix in ("", "-wal") if os.path.exists(path + suffix))
+            size = f"{size_bytes / 1024:.0f} KiB"
+        print(f"{label:<22}{report(turn_timings):>28}{report(read_timings):>28}{size:>10}")
+
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Manage or benchmark the agents' checkpoint store")
+    parser.add_argument("--benchmark", action="store_true", help="Compare per-turn checkpoint latency with MemorySaver")
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--prune", type=float, metavar="SECONDS", help="Delete threads idle for longer than this")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        asyncio.run(benchmark(args.turns))
+    elif args.prune is not None:
+        async def prune():
+            checkpointer = SQLiteCheckpointer(CHECKPOINT_DB)
+            print(f"Pruned {await checkpointer.prune(args.prune)} threads from {CHECKPOINT_DB}")
+            await checkpointer.close()
+        asyncio.run(prune())
+    else:
+        parser.print_help()
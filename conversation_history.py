@@ -0,0 +1,130 @@
+import logging
+from typing import Any, Dict, List
+
+from langchain_core.messages import AnyMessage, HumanMessage, RemoveMessage, SystemMessage, ToolMessage
+from langchain_core.messages.utils import count_tokens_approximately, get_buffer_string, trim_messages
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_PROMPT = """You maintain a running summary of a conversation between a user and an AI assistant.
+
+Current summary:
+{summary}
+
+Older messages that are being removed from the conversation:
+{transcript}
+
+Update the summary so it also covers these messages. Keep facts, names, numbers, file paths,
+decisions and open questions the assistant may need later; drop small talk. Reply with the
+updated summary only, in at most {max_words} words."""
+
+
+class HistoryManager:
+    """
+    Keeps the conversation an agent resends to the LLM every turn within a token budget.
+
+    It runs as the first node of every turn and
+      - replaces large tool outputs from earlier turns with a compact reference, since the
+        model has already read them and answered
+      - once the history grows past `max_tokens`, folds the oldest turns into a running
+        summary and removes them from the checkpointed state, keeping about `keep_tokens`
+        of the most recent turns. Only the turns being dropped are sent to the summarizer,
+        so summarizing stays cheap however long the session gets.
+
+    The chat node sends `context(state)`, the summary followed by the recent messages.
+
+    Args:
+        llm: Chat model used to write the summary
+        max_tokens: Token budget for the messages kept in the state
+        keep_tokens: Tokens of recent messages kept after summarizing (half of max_tokens by default)
+        tool_output_max_chars: Tool outputs longer than this are elided once their turn is over
+        summary_max_words: Upper bound on the length of the running summary
+    """
+    def __init__(self, llm, max_tokens: int = 3000, keep_tokens: int | None = None,
+                 tool_output_max_chars: int = 1500, summary_max_words: int = 200):
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.keep_tokens = keep_tokens or max_tokens // 2
+        self.tool_output_max_chars = tool_output_max_chars
+        self.summary_max_words = summary_max_words
+
+    def compact_tool_output(self, message: ToolMessage) -> ToolMessage | None:
+        """Returns a short reference standing in for a large tool output, or None if it is small"""
+        content = message.text
+        if len(content) <= self.tool_output_max_chars:
+            return None
+        preview = " ".join(content[:300].split())
+        return ToolMessage(
+            content=(
+                f"[output of tool '{message.name}' from an earlier turn, {len(content)} characters, "
+                f"elided after use. It began: {preview}...]"
+            ),
+            tool_call_id=message.tool_call_id,
+            name=message.name,
+            id=message.id,
+        )
+
+    async def summarize(self, summary: str, messages: List[AnyMessage]) -> str:
+        prompt = SUMMARY_PROMPT.format(
+            summary=summary or "(none yet)",
+            transcript=get_buffer_string(messages),
+            max_words=self.summary_max_words,
+        )
+        response = await self.llm.ainvoke(prompt)
+        return response.text.strip()
+
+    async def node(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        messages = state["messages"]
+        summary = state.get("summary", "")
+        updates: List[AnyMessage] = []
+
+        # the node runs before the model sees the new user message, so every tool
+        # output in the state belongs to a turn that has already been answered
+        history = []
+        for message in messages:
+            if isinstance(message, ToolMessage):
+                compacted = self.compact_tool_output(message)
+                if compacted is not None:
+                    updates.append(compacted)
+                    message = compacted
+            history.append(message)
+
+        if count_tokens_approximately(history) > self.max_tokens:
+            # keep whole turns only: the window starts at a user message, so tool calls
+            # are never separated from their results
+            kept = trim_messages(
+                history,
+                strategy="last",
+                max_tokens=self.keep_tokens,
+                token_counter=count_tokens_approximately,
+                start_on="human",
+            )
+            if not kept:
+                # the latest turn alone is over budget, it is still needed in full
+                last_human = max(i for i, m in enumerate(history) if isinstance(m, HumanMessage))
+                kept = history[last_human:]
+
+            dropped = history[:len(history) - len(kept)]
+            if dropped:
+                summary = await self.summarize(summary, dropped)
+                dropped_ids = {message.id for message in dropped}
+                updates = [message for message in updates if message.id not in dropped_ids]
+                updates += [RemoveMessage(id=message.id) for message in dropped]
+                history = kept
+
+        logger.debug(
+            f"{len(history)} messages, ~{count_tokens_approximately(history)} tokens"
+            + (f" + ~{len(summary) // 4} summary tokens" if summary else "")
+        )
+
+        result: Dict[str, Any] = {"messages": updates}
+        if summary != state.get("summary", ""):
+            result["summary"] = summary
+        return result
+
+    def context(self, state: Dict[str, Any]) -> List[AnyMessage]:
+        """The messages to send to the LLM: the running summary, then the recent conversation"""
+        summary = state.get("summary")
+        if not summary:
+            return state["messages"]
+        return [SystemMessage(f"Summary of the earlier conversation:\n{summary}")] + list(state["messages"])
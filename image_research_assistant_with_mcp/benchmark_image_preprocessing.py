@@ -0,0 +1,112 @@
+import argparse
+import io
+import statistics
+import time
+from typing import Dict, List, Tuple
+
+from PIL import Image
+
+from visual_analysis_server import describe_image_bytes, prepare_image_for_vision
+
+# (label, width, height) of the synthetic photos used when no images are given
+SYNTHETIC_SIZES = [
+    ("< 1 MP", 800, 600),
+    ("1-4 MP", 2048, 1536),
+    ("4-12 MP", 4032, 3024),
+    ("> 12 MP", 6000, 4000),
+]
+
+
+def synthetic_photo(width: int, height: int) -> bytes:
+    """
+    Builds a JPEG with photo-like entropy (gradient plus sensor noise), so it
+    compresses roughly like a real phone photo
+    """
+    gradient = Image.linear_gradient("L").resize((width, height))
+    noise = Image.effect_noise((width, height), 40)
+    image = Image.merge("RGB", (gradient, noise, Image.blend(gradient, noise, 0.5)))
+    buffer = io.BytesIO()
+    image.save(buffer, format="JPEG", quality=95)
+    return buffer.getvalue()
+
+
+def size_bucket(width: int, height: int) -> str:
+    megapixels = width * height / 1_000_000
+    if megapixels < 1:
+        return "< 1 MP"
+    if megapixels < 4:
+        return "1-4 MP"
+    if megapixels < 12:
+        return "4-12 MP"
+    return "> 12 MP"
+
+
+def load_images(paths: List[str]) -> List[Tuple[str, bytes, str]]:
+    images = []
+    if paths:
+        for path in paths:
+            with open(path, "rb") as f:
+                data = f.read()
+            with Image.open(io.BytesIO(data)) as image:
+                images.append((size_bucket(*image.size), data, Image.MIME.get(image.format, "image/jpeg")))
+    else:
+        for label, width, height in SYNTHETIC_SIZES:
+            images.append((label, synthetic_photo(width, height), "image/jpeg"))
+    return images
+
+
+def run_benchmark(paths: List[str], rounds: int, call_gemini: bool):
+    results: Dict[str, Dict[str, list]] = {}
+
+    for bucket, data, mime_type in load_images(paths):
+        stats = results.setdefault(bucket, {
+            "original": [], "sent": [], "prepare": [], "raw_e2e": [], "prepared_e2e": []
+        })
+        for _ in range(rounds):
+            start = time.perf_counter()
+            prepared, prepared_mime = prepare_image_for_vision(data, mime_type)
+            stats["prepare"].append(time.perf_counter() - start)
+            stats["original"].append(len(data))
+            stats["sent"].append(len(prepared))
+
+        if call_gemini:
+            start = time.perf_counter()
+            describe_image_bytes(data, mime_type)
+            stats["raw_e2e"].append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            prepared, prepared_mime = prepare_image_for_vision(data, mime_type)
+            describe_image_bytes(prepared, prepared_mime)
+            stats["prepared_e2e"].append(time.perf_counter() - start)
+
+    print("\nImage preprocessing benchmark")
+    print("---"*30)
+    header = f"{'bucket':<10}{'original KiB':>14}{'sent KiB':>12}{'prepare ms':>12}"
+    if call_gemini:
+        header += f"{'raw e2e ms':>14}{'prepared e2e ms':>18}"
+    print(header)
+
+    for bucket, stats in results.items():
+        line = (
+            f"{bucket:<10}"
+            f"{statistics.mean(stats['original']) / 1024:>14.0f}"
+            f"{statistics.mean(stats['sent']) / 1024:>12.0f}"
+            f"{1000 * statistics.mean(stats['prepare']):>12.1f}"
+        )
+        if call_gemini:
+            line += (
+                f"{1000 * statistics.mean(stats['raw_e2e']):>14.0f}"
+                f"{1000 * statistics.mean(stats['prepared_e2e']):>18.0f}"
+            )
+        print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark image preprocessing before vision analysis")
+    parser.add_argument("images", nargs="*", help="Images to benchmark. Synthetic photos are used if omitted")
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--call-gemini", action="store_true",
+                        help="Also measure end-to-end latency of the Gemini call with raw and prepared bytes")
+    args = parser.parse_args()
+
+    run_benchmark(args.images, args.rounds, args.call_gemini)
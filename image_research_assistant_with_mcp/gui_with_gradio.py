@@ -1,5 +1,7 @@
 import asyncio
-from mcp import StdioServerParameters
+import os
+import time
+from collections import OrderedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import AnyMessage, add_messages
 from langgraph.checkpoint.memory import MemorySaver
@@ -11,15 +13,21 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 import gradio as gr
 
-# Import the MultiServerMCPClient
-from langchain_mcp_adapters.client import MultiServerMCPClient
+import sys
+from pathlib import Path
+
+# the session pool, history manager and checkpointer live at the repository root, next to the other MCP clients
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from mcp_session_pool import MCPSessionPool, ServerToolCatalog
+from conversation_history import HistoryManager
+from checkpointing import create_checkpointer, close_checkpointer
 
 # --- Multi-server configuration dictionary ---
 # This dictionary defines all the servers the client will connect to
 server_configs = {
     "wikipedia":{
         "command": "python",
-        "args": ["visual_analysis_server.py"],
+        "args": ["wikipedia_research_server.py"],
         "transport": "stdio"
     },
     "vision": {
@@ -29,12 +37,69 @@ server_configs = {
     }
 }
 
+# To share one warm server between many clients, start it once with
+#   python visual_analysis_server.py --transport streamable-http --port 8004
+# and point the config at its URL instead, e.g. "vision": "http://127.0.0.1:8004/mcp"
+
+# the agent is I/O bound (Gemini and MCP calls), so several users can be served at
+# once; beyond that requests wait in the queue instead of piling up on the servers
+AGENT_CONCURRENCY = int(os.environ.get("GRADIO_AGENT_CONCURRENCY", 8))
+MAX_QUEUE_SIZE = int(os.environ.get("GRADIO_MAX_QUEUE_SIZE", 64))
+
+# bounds on the per-browser-session conversations kept on the server
+MAX_SESSIONS = int(os.environ.get("GRADIO_MAX_SESSIONS", 200))
+SESSION_IDLE_TIMEOUT = float(os.environ.get("GRADIO_SESSION_IDLE_TIMEOUT", 30 * 60))
+# only the most recent chat entries are sent back and forth with the browser
+MAX_CHAT_HISTORY = int(os.environ.get("GRADIO_MAX_CHAT_HISTORY", 40))
+
+
+class SessionRegistry:
+    """
+    Gives every browser session its own agent thread and keeps the number of
+    threads held in the checkpointer bounded.
+
+    Threads idle for longer than `idle_timeout` are evicted, and when more than
+    `max_sessions` are active the least recently used one is evicted.
+    """
+    def __init__(self, checkpointer, max_sessions: int = MAX_SESSIONS, idle_timeout: float = SESSION_IDLE_TIMEOUT):
+        self.checkpointer = checkpointer
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        # session hash -> last time it was used, least recently used first
+        self.last_seen: OrderedDict[str, float] = OrderedDict()
+
+    @staticmethod
+    def thread_id(session_hash: str) -> str:
+        return f"gradio-{session_hash}"
+
+    async def touch(self, session_hash: str) -> str:
+        """Marks the session as active and returns its agent thread id"""
+        now = time.monotonic()
+        self.last_seen[session_hash] = now
+        self.last_seen.move_to_end(session_hash)
+
+        while self.last_seen:
+            oldest, seen = next(iter(self.last_seen.items()))
+            if len(self.last_seen) <= self.max_sessions and now - seen <= self.idle_timeout:
+                break
+            await self.end(oldest)
+
+        return self.thread_id(session_hash)
+
+    async def end(self, session_hash: str):
+        """Drops the session and its checkpointed conversation"""
+        self.last_seen.pop(session_hash, None)
+        await self.checkpointer.adelete_thread(self.thread_id(session_hash))
+
+
 # LangGraph state definition (remains the same)
 class State(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
+    # running summary of the turns dropped from messages
+    summary: str
 
 # --- 'create_graph' now accepts the list of tools directly ---
-def create_graph(tools: list):
+def create_graph(tools: list, checkpointer=None):
     # LLM configuration (remains the same)
     llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, google_api_key="{{GOOGLE_GEMINI_API_KEY}}" )
     llm_with_tools = llm.bind_tools(tools)
@@ -50,30 +115,87 @@ def create_graph(tools: list):
 
     chat_llm = prompt_template | llm_with_tools
 
-    # Define chat node (remains the same)
-    def chat_node(state: State) -> State:
-        response = chat_llm.invoke({"messages": state["messages"]})
+    # image descriptions and Wikipedia articles from earlier turns are elided, old turns summarized
+    history = HistoryManager(llm)
+
+    # async so the model's tokens can be streamed to the web ui as they arrive
+    async def chat_node(state: State) -> State:
+        response = await chat_llm.ainvoke({"messages": history.context(state)})
         return {"messages": [response]}
 
     # Build LangGraph with tool routing (remains the same)
     graph = StateGraph(State)
+    graph.add_node("history_node", history.node)
     graph.add_node("chat_node", chat_node)
     graph.add_node("tool_node", ToolNode(tools=tools))
-    graph.add_edge(START, "chat_node")
+    graph.add_edge(START, "history_node")
+    graph.add_edge("history_node", "chat_node")
     graph.add_conditional_edges("chat_node", tools_condition, {
         "tools": "tool_node",
         "__end__": END
     })
     graph.add_edge("tool_node", "chat_node")
 
-    return graph.compile(checkpointer=MemorySaver())
+    # a shared checkpointer keeps the conversation when the graph is rebuilt with new tools
+    return graph.compile(checkpointer=checkpointer or MemorySaver())
+
+def chunk_text(chunk) -> str:
+    """Text of a streamed message chunk, whose content may be a string or a list of parts"""
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in chunk.content
+    )
+
+async def iterate_on_loop(loop: asyncio.AbstractEventLoop, agen):
+    """
+    Runs an async generator on another thread's event loop and yields its items on
+    the calling loop. Gradio runs handlers on its own server loop, while the MCP
+    sessions and the checkpointer belong to the loop that created them in main(),
+    so each turn is executed there.
+    """
+    caller = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+
+    async def pump():
+        try:
+            async for item in agen:
+                caller.call_soon_threadsafe(queue.put_nowait, (item, None))
+        except Exception as e:
+            caller.call_soon_threadsafe(queue.put_nowait, (done, e))
+        else:
+            caller.call_soon_threadsafe(queue.put_nowait, (done, None))
+
+    future = asyncio.run_coroutine_threadsafe(pump(), loop)
+    try:
+        while True:
+            item, error = await queue.get()
+            if item is done:
+                if error is not None:
+                    raise error
+                return
+            yield item
+    finally:
+        # a closed browser tab stops the turn on the owning loop too
+        future.cancel()
 
 async def main():
-    client = MultiServerMCPClient(server_configs)
+    # launch the vision and wikipedia servers concurrently and start serving
+    # as soon as the first one is ready; the other one's tools are picked up later
+    pool = MCPSessionPool(server_configs)
+    catalog = ServerToolCatalog(pool)
+    await pool.start(wait_for_all=False)
+    await pool.wait_for_any()
 
-    all_tools = await client.get_tools() 
+    checkpointer = await create_checkpointer()
+    sessions = SessionRegistry(checkpointer)
+    agent_version = catalog.version
+    agent = create_graph(catalog.tools, checkpointer)
 
-    agent = create_graph(all_tools)
+    # the loop owning the pool's sessions and the checkpointer
+    loop = asyncio.get_running_loop()
 
     print("The image research assistant is ready and launching on a web ui")
 
@@ -91,7 +213,15 @@ async def main():
         
         submit_btn=gr.Button("Submit", variant="primary")
 
-        async def get_agent_response(user_text, image_path, chat_history):
+        async def respond(user_text, image_path, chat_history, session_hash):
+            """One agent turn, run on main()'s loop. Copies of the history are yielded since Gradio reads them on its own thread"""
+            nonlocal agent, agent_version
+
+            # each browser session gets its own conversation thread
+            thread_id = await sessions.touch(session_hash)
+            start = time.perf_counter()
+            first_output = first_token = None
+
             if image_path: 
                 full_message = f"{user_text} {image_path}"
 
@@ -101,25 +231,108 @@ async def main():
                 full_message = user_text
                 chat_history.append((user_text, None))
 
-            response = await agent.ainvoke(
+            # show the question straight away and keep the image box until the turn ends
+            yield "", list(chat_history), image_path
+
+            # rebuild the agent if a slower server has come online since the last turn
+            if catalog.version != agent_version:
+                agent_version = catalog.version
+                agent = create_graph(catalog.tools, checkpointer)
+
+            # one chat entry lists the tools of this turn as they run, answers stream below it
+            progress = {}
+            progress_index = None
+            answer = ""
+            answer_index = None
+
+            async for event in agent.astream_events(
                 {"messages": [("user", full_message)]},
                 config={
-                    "configurable": {"thread_id": "gradio_session"}
-                }
+                    "configurable": {"thread_id": thread_id}
+                },
+                version="v2",
+            ):
+                kind = event["event"]
+
+                # the history node's summarizer is a model call too, only chat_node answers the user
+                if kind.startswith("on_chat_model") and event["metadata"].get("langgraph_node") != "chat_node":
+                    continue
+
+                if kind in ("on_tool_start", "on_tool_end"):
+                    if kind == "on_tool_start":
+                        progress[event["run_id"]] = f"⏳ Running `{event['name']}`..."
+                    else:
+                        elapsed = time.perf_counter() - start
+                        progress[event["run_id"]] = f"✔️ `{event['name']}` done ({elapsed:.1f}s)"
+
+                    if progress_index is None:
+                        chat_history.append((None, ""))
+                        progress_index = len(chat_history) - 1
+                    chat_history[progress_index] = (None, "\n".join(progress.values()))
+
+                elif kind == "on_chat_model_start":
+                    # every model call (e.g. the one after the tools ran) gets its own entry
+                    answer = ""
+                    answer_index = None
+                    continue
+
+                elif kind == "on_chat_model_stream":
+                    text = chunk_text(event["data"]["chunk"])
+                    if not text:
+                        continue
+                    if first_token is None:
+                        first_token = time.perf_counter() - start
+
+                    answer += text
+                    if answer_index is None:
+                        chat_history.append((None, ""))
+                        answer_index = len(chat_history) - 1
+                    chat_history[answer_index] = (None, answer)
+
+                else:
+                    continue
+
+                if first_output is None:
+                    first_output = time.perf_counter() - start
+                yield "", list(chat_history), image_path
+
+            total = time.perf_counter() - start
+            print(
+                f"[{thread_id}] first output after {first_output or total:.2f}s, "
+                f"first answer token after {first_token or total:.2f}s, done in {total:.2f}s"
             )
 
-            bot_message = response["messages"][-1].content
-            chat_history.append((None, bot_message))
+            chat_history = chat_history[-MAX_CHAT_HISTORY:]
+            yield "", chat_history, None # clear textbox, return updated history, clear imagebox
 
-            return "", chat_history, None # clear textbox, return updated history, clear imagebox
+        async def get_agent_response(user_text, image_path, chat_history, request: gr.Request):
+            async for update in iterate_on_loop(loop, respond(user_text, image_path, chat_history, request.session_hash)):
+                yield update
 
-        submit_btn.clikc(
+        submit_btn.click(
             get_agent_response,
             [text_box, image_box, chatbot],
-            [text_box, chatbot, image_box]
+            [text_box, chatbot, image_box],
+            api_name="chat",
+            concurrency_limit=AGENT_CONCURRENCY,
         )
-    
-    demo.launch(server_name="0.0.0.0")
+
+        # free the conversation as soon as the tab is closed instead of waiting for the idle timeout
+        async def end_session(request: gr.Request):
+            await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(sessions.end(request.session_hash), loop))
+
+        demo.unload(end_session)
+
+    demo.queue(max_size=MAX_QUEUE_SIZE)
+    # launch without blocking, this loop has to keep running to serve the pool and the checkpointer
+    demo.launch(server_name="0.0.0.0", prevent_thread_lock=True)
+    try:
+        await asyncio.Event().wait()
+    finally:
+        # ctrl+c cancels the wait
+        demo.close()
+        await close_checkpointer(checkpointer)
+        await pool.close()
     
 
 if __name__ == "__main__":
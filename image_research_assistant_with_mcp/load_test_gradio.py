@@ -0,0 +1,83 @@
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+
+from gradio_client import Client
+
+DEFAULT_QUESTIONS = [
+    "Who designed the Eiffel Tower?",
+    "When was it built?",
+    "Summarize what you told me so far in one sentence.",
+]
+
+
+def simulate_user(url: str, questions: List[str]) -> Tuple[List[float], List[float]]:
+    """
+    Plays one user holding a multi-turn conversation. Every Client gets its own
+    Gradio session, so each simulated user has its own agent thread on the server.
+
+    Returns:
+        The time to the first visible assistant output and the full latency of every turn, in seconds
+    """
+    client = Client(url, verbose=False)
+    first_outputs, latencies = [], []
+    for question in questions:
+        start = time.perf_counter()
+        first_output = None
+        # the handler streams, every update is (textbox, chat history, image)
+        for _, history, _ in client.submit(question, None, [], api_name="/chat"):
+            if first_output is None and history and history[-1][1] is not None:
+                first_output = time.perf_counter() - start
+        latency = time.perf_counter() - start
+        first_outputs.append(first_output or latency)
+        latencies.append(latency)
+    client.close()
+    return first_outputs, latencies
+
+
+def percentile(values: List[float], q: float) -> float:
+    return values[int(q * (len(values) - 1))]
+
+
+def load_test(url: str, users: int, questions: List[str]):
+    """
+    Runs `users` simulated users concurrently against the image research assistant
+    and reports request throughput, latency percentiles and time to first output.
+
+    Args:
+        url: Address of the running Gradio app, e.g. http://127.0.0.1:7860
+        users: Number of concurrent users
+        questions: Turns each user sends, in order
+    """
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=users) as executor:
+        per_user = list(executor.map(lambda _: simulate_user(url, questions), range(users)))
+    elapsed = time.perf_counter() - start
+
+    first_outputs = sorted(first for user in per_user for first in user[0])
+    latencies = sorted(latency for user in per_user for latency in user[1])
+
+    print(f"\nLoad test against {url}")
+    print("---"*20)
+    print(f"users:         {users} concurrent, {len(questions)} turns each")
+    print(f"requests:      {len(latencies)} in {elapsed:.1f}s")
+    print(f"throughput:    {len(latencies) / elapsed:.2f} requests/sec")
+    print(f"latency p50:   {1000 * statistics.median(latencies):.0f} ms")
+    print(f"latency p95:   {1000 * percentile(latencies, 0.95):.0f} ms")
+    print(f"latency p99:   {1000 * percentile(latencies, 0.99):.0f} ms")
+    print(f"latency max:   {1000 * latencies[-1]:.0f} ms")
+    print(f"first output:  p50 {1000 * statistics.median(first_outputs):.0f} ms, "
+          f"p95 {1000 * percentile(first_outputs, 0.95):.0f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test the image research assistant web ui")
+    parser.add_argument("--url", default="http://127.0.0.1:7860")
+    parser.add_argument("--users", type=int, default=16)
+    parser.add_argument("--question", action="append", dest="questions",
+                        help="A turn to send (repeatable). Defaults to a short three-turn conversation")
+    args = parser.parse_args()
+
+    load_test(args.url, args.users, args.questions or DEFAULT_QUESTIONS)
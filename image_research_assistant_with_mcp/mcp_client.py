@@ -1,5 +1,4 @@
 import asyncio
-from mcp import StdioServerParameters
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import AnyMessage, add_messages
 from langgraph.checkpoint.memory import MemorySaver
@@ -10,15 +9,21 @@ from typing_extensions import TypedDict
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-# Import the MultiServerMCPClient
-from langchain_mcp_adapters.client import MultiServerMCPClient
+import sys
+from pathlib import Path
+
+# the session pool, history manager and checkpointer live at the repository root, next to the other MCP clients
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from mcp_session_pool import MCPSessionPool, ServerToolCatalog, ainput
+from conversation_history import HistoryManager
+from checkpointing import create_checkpointer, close_checkpointer
 
 # --- Multi-server configuration dictionary ---
 # This dictionary defines all the servers the client will connect to
 server_configs = {
     "wikipedia":{
         "command": "python",
-        "args": ["visual_analysis_server.py"],
+        "args": ["wikipedia_research_server.py"],
         "transport": "stdio"
     },
     "vision": {
@@ -28,12 +33,18 @@ server_configs = {
     }
 }
 
+# To share one warm server between many clients, start it once with
+#   python visual_analysis_server.py --transport streamable-http --port 8004
+# and point the config at its URL instead, e.g. "vision": "http://127.0.0.1:8004/mcp"
+
 # LangGraph state definition (remains the same)
 class State(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
+    # running summary of the turns dropped from messages
+    summary: str
 
 # --- 'create_graph' now accepts the list of tools directly ---
-def create_graph(tools: list):
+def create_graph(tools: list, checkpointer=None):
     # LLM configuration (remains the same)
     llm = ChatGoogleGenerativeAI(model="gemini-2.0-flash", temperature=0, google_api_key="{{GOOGLE_GEMINI_API_KEY}}" )
     llm_with_tools = llm.bind_tools(tools)
@@ -49,38 +60,55 @@ def create_graph(tools: list):
 
     chat_llm = prompt_template | llm_with_tools
 
+    # image descriptions and Wikipedia articles from earlier turns are elided, old turns summarized
+    history = HistoryManager(llm)
+
     # Define chat node (remains the same)
     def chat_node(state: State) -> State:
-        response = chat_llm.invoke({"messages": state["messages"]})
+        response = chat_llm.invoke({"messages": history.context(state)})
         return {"messages": [response]}
 
     # Build LangGraph with tool routing (remains the same)
     graph = StateGraph(State)
+    graph.add_node("history_node", history.node)
     graph.add_node("chat_node", chat_node)
     graph.add_node("tool_node", ToolNode(tools=tools))
-    graph.add_edge(START, "chat_node")
+    graph.add_edge(START, "history_node")
+    graph.add_edge("history_node", "chat_node")
     graph.add_conditional_edges("chat_node", tools_condition, {
         "tools": "tool_node",
         "__end__": END
     })
     graph.add_edge("tool_node", "chat_node")
 
-    return graph.compile(checkpointer=MemorySaver())
+    # a shared checkpointer keeps the conversation when the graph is rebuilt with new tools
+    return graph.compile(checkpointer=checkpointer or MemorySaver())
 
 async def main():
-    client = MultiServerMCPClient(server_configs)
+    # launch the vision and wikipedia servers concurrently and start serving
+    # as soon as the first one is ready; the other one's tools are picked up later
+    pool = MCPSessionPool(server_configs)
+    catalog = ServerToolCatalog(pool)
+    await pool.start(wait_for_all=False)
+    await pool.wait_for_any()
 
-    all_tools = await client.get_tools() 
-
-    agent = create_graph(all_tools)
+    checkpointer = await create_checkpointer()
+    agent_version = catalog.version
+    agent = create_graph(catalog.tools, checkpointer)
 
     print("The image assistant is ready")
 
     while True: 
-        user_input = input("\nYou: ").strip() 
+        # reading input without blocking the loop lets slower servers finish starting meanwhile
+        user_input = (await ainput("\nYou: ")).strip()
         if user_input.lower() in {"exit", "quit", "q"}:
             break 
 
+        # rebuild the agent if a slower server has come online since the last turn
+        if catalog.version != agent_version:
+            agent_version = catalog.version
+            agent = create_graph(catalog.tools, checkpointer)
+
         try: 
             response = await agent.ainvoke(
                 {"messages": [
@@ -88,7 +116,7 @@ async def main():
                 ]},
                 config={
                     "configurable": {
-                        "thread_id": "multi-server-session"
+                        "thread_id": "image-research-session"
                     }
                 }
             )
@@ -96,5 +124,8 @@ async def main():
         except Exception as e: 
             print("Error:", e)
 
+    await close_checkpointer(checkpointer)
+    await pool.close()
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
@@ -1,50 +1,192 @@
 import os 
-import base64
+import sys
+import asyncio
+import hashlib
+import io
+import logging
+import diskcache
 import mimetypes 
+import threading
+from collections import OrderedDict
 from pathlib import Path 
+from typing import Dict, List, Optional, Tuple
+from PIL import Image, ImageOps
 from google import genai 
 from google.genai import types
 from mcp.server.fastmcp import FastMCP 
 
+# the transport helper lives at the repository root, next to the other MCP servers
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from mcp_http_transport import run_server
+
+# stdout carries the MCP protocol over stdio, so diagnostics go to stderr
+logger = logging.getLogger(__name__)
+
 # initialize the fastmcp server
 mcp = FastMCP("VisualAnalysisServer")
 
+# images are kept server-side and referenced by a short handle, so the image bytes
+# never have to pass through the LLM context
+IMAGE_STORE_MAX_BYTES = int(os.environ.get("IMAGE_STORE_MAX_BYTES", 256 * 1024 * 1024))
+
+
+class ImageBlobStore:
+    """
+    Content-addressed, in-memory store of image bytes.
+
+    Identical images map to the same handle. When the byte budget is exceeded the
+    least recently used images are evicted.
+    """
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._blobs: "OrderedDict[str, Dict]" = OrderedDict()
+        # batch analysis touches the store from worker threads
+        self._lock = threading.Lock()
+
+    def put(self, data: bytes, mime_type: str, width: int, height: int) -> Dict:
+        handle = "img_" + hashlib.sha256(data).hexdigest()[:16]
+        with self._lock:
+            return self._put(handle, data, mime_type, width, height)
+
+    def _put(self, handle: str, data: bytes, mime_type: str, width: int, height: int) -> Dict:
+        if handle in self._blobs:
+            self._blobs.move_to_end(handle)
+            return self._blobs[handle]
+
+        entry = {
+            "image_handle": handle,
+            "mime_type": mime_type,
+            "width": width,
+            "height": height,
+            "size_bytes": len(data),
+            "data": data,
+        }
+        self._blobs[handle] = entry
+        self.total_bytes += len(data)
+
+        # evict least recently used images until we are back under budget,
+        # always keeping the image that was just stored
+        while self.total_bytes > self.max_bytes and len(self._blobs) > 1:
+            _, evicted = self._blobs.popitem(last=False)
+            self.total_bytes -= evicted["size_bytes"]
+        return entry
+
+    def get(self, handle: str) -> Optional[Dict]:
+        with self._lock:
+            entry = self._blobs.get(handle)
+            if entry is not None:
+                self._blobs.move_to_end(handle)
+            return entry
+
+
+image_store = ImageBlobStore(IMAGE_STORE_MAX_BYTES)
+
+# full-resolution photos rarely help a landmark identification, so images are
+# downscaled and recompressed before being sent to the vision model
+VISION_MAX_EDGE = int(os.environ.get("VISION_MAX_EDGE", 1536))
+VISION_TARGET_BYTES = int(os.environ.get("VISION_TARGET_BYTES", 400 * 1024))
+JPEG_QUALITIES = (85, 75, 65, 55, 45)
+
+
+def prepare_image_for_vision(data: bytes, mime_type: str, max_edge: int = VISION_MAX_EDGE,
+                             target_bytes: int = VISION_TARGET_BYTES) -> Tuple[bytes, str]:
+    """
+    Downscales an image to max_edge pixels on its longest side, strips its metadata
+    and re-encodes it as a JPEG of at most target_bytes where possible.
+
+    Args:
+        data: The original image bytes
+        mime_type: The original MIME type, returned unchanged if the image cannot be decoded
+        max_edge: Maximum width or height in pixels
+        target_bytes: Size the re-encoded image should fit in
+
+    Returns:
+        A tuple of (image bytes, MIME type) to send to the vision model
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as original:
+            # JPEGs can be decoded directly at a reduced scale, which is much
+            # cheaper than decoding the full image and resizing afterwards
+            original.draft("RGB", (max_edge, max_edge))
+
+            # apply the camera orientation before the EXIF data is dropped
+            image = ImageOps.exif_transpose(original)
+
+        # flatten transparency onto white, JPEG has no alpha channel
+        if image.mode in ("RGBA", "LA") or (image.mode == "P" and "transparency" in image.info):
+            rgba = image.convert("RGBA")
+            image = Image.new("RGB", rgba.size, "white")
+            image.paste(rgba, mask=rgba.getchannel("A"))
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        edge = max_edge
+        while True:
+            resized = image.copy()
+            resized.thumbnail((edge, edge), Image.LANCZOS)
+
+            # saving without exif/icc arguments strips the metadata
+            for quality in JPEG_QUALITIES:
+                buffer = io.BytesIO()
+                resized.save(buffer, format="JPEG", quality=quality, optimize=True)
+                if buffer.tell() <= target_bytes:
+                    return buffer.getvalue(), "image/jpeg"
+
+            # still too large at the lowest quality, shrink further
+            if edge <= 256:
+                return buffer.getvalue(), "image/jpeg"
+            edge = int(edge * 0.75)
+
+    except Exception:
+        # formats Pillow cannot decode are sent as they are
+        return data, mime_type
+
+
+def _public_info(entry: Dict) -> Dict:
+    # everything except the raw bytes
+    return {key: value for key, value in entry.items() if key != "data"}
+
+
+def _load_image(file_path: str) -> Dict:
+    image_path = Path(file_path)
+    if not image_path.is_file():
+        raise FileNotFoundError(file_path)
+
+    # open the file in binary read mode 
+    with open(image_path, 'rb') as f:
+        image_bytes = f.read() 
+
+    # Pillow only parses the header here, the pixels are not decoded
+    with Image.open(io.BytesIO(image_bytes)) as image:
+        width, height = image.size
+        mime_type = Image.MIME.get(image.format)
+
+    if not mime_type:
+        mime_type, _ = mimetypes.guess_type(image_path)
+    if not mime_type:
+        mime_type = "application/octet-stream"
+
+    return image_store.put(image_bytes, mime_type, width, height)
+
+
 @mcp.tool()
 def load_image_from_path(file_path: str) -> dict:
     """
-    Loads an image from a server-accessible file path, encodes it to Base64
-    and determines its MIME type
+    Loads an image from a server-accessible file path into the server's image store
+    and returns a short handle for it. Pass the handle to the analysis tools instead
+    of the image itself.
 
     Args:
         file_path: The absolute path to the image file, which must be accessible
                    by the server running the tool 
     
     Returns:
-        A dictionary containing the 'base64_image_string' and 'mime_type', or an 
-        'error' key if loading fails
+        A dictionary containing the 'image_handle', 'mime_type', 'width', 'height' and
+        'size_bytes' of the image, or an 'error' key if loading fails
     """
     try: 
-        image_path = Path(file_path)
-        if not image_path.is_file():
-            return {
-                "error": f"File not found at path: {file_path}"
-            }
-        
-        # open the file in binary read mode 
-        with open(image_path, 'rb') as f:
-            image_path = f.read() 
-
-        base64_string = base64.b64decode(image_path).decode('utf-8')
-
-        mime_type, _ = mimetypes.guess_type(image_path)
-
-        if not mime_type:
-            mime_type = "application/octet-stream"
-        
-        return {
-            "base64_image_string": base64_string,
-            "mime_type": mime_type
-        }
+        return _public_info(_load_image(file_path))
     
     except FileNotFoundError:
         return {
@@ -55,52 +197,278 @@ def load_image_from_path(file_path: str) -> dict:
             "error": f"An unexpected error occured while loading the image {str(e)}"
         }
         
+# descriptions are cached on disk, keyed by the exact image content, with a
+# perceptual-hash lookup so resized copies and re-saved screenshots also hit
+DESCRIPTION_CACHE_DIR = os.environ.get(
+    "DESCRIPTION_CACHE_DIR", str(Path(__file__).resolve().parent / ".description_cache")
+)
+DESCRIPTION_CACHE_TTL = int(os.environ.get("DESCRIPTION_CACHE_TTL", 7 * 24 * 3600))
+DESCRIPTION_CACHE_MAX_BYTES = int(os.environ.get("DESCRIPTION_CACHE_MAX_BYTES", 100 * 1024 * 1024))
+# two 64-bit hashes within this many differing bits are treated as the same picture
+NEAR_DUPLICATE_MAX_DISTANCE = 6
+
+
+def perceptual_hash(data: bytes) -> Optional[int]:
+    """
+    64-bit difference hash (dHash) of an image: robust to resizing, recompression
+    and small edits, so near-identical uploads produce (almost) the same hash.
+    Returns None for images Pillow cannot decode.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            # only a thumbnail is needed, let JPEGs decode at a fraction of their size
+            image.draft("L", (64, 64))
+            small = ImageOps.exif_transpose(image).convert("L").resize((9, 8), Image.LANCZOS)
+    except Exception:
+        return None
+
+    pixels = list(small.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left, right = pixels[row * 9 + col], pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (left > right)
+    return bits
+
+
+class DescriptionCache:
+    """
+    Persistent cache of image descriptions.
+
+    Entries expire after a TTL and the cache is kept under a byte budget with
+    least-recently-used eviction. The perceptual hashes of cached images are mirrored
+    in memory for the near-duplicate lookup.
+    """
+    def __init__(self, directory: str, ttl_seconds: int, size_limit: int,
+                 max_distance: int = NEAR_DUPLICATE_MAX_DISTANCE):
+        self.ttl_seconds = ttl_seconds
+        self.max_distance = max_distance
+        self._cache = diskcache.Cache(
+            directory, size_limit=size_limit, eviction_policy="least-recently-used"
+        )
+        self._phashes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        for key in self._cache.iterkeys():
+            if isinstance(key, tuple) and key[0] == "phash":
+                phash = self._cache.get(key)
+                if phash is not None:
+                    self._phashes[key[1]] = phash
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+
+    def get(self, content_key: str) -> Optional[str]:
+        """Looks up a description by exact image content"""
+        description = self._cache.get(("description", content_key))
+        if description is not None:
+            with self._lock:
+                self.exact_hits += 1
+        return description
+
+    def find_similar(self, phash: Optional[int]) -> Optional[str]:
+        """Looks up the description of a near-identical image, counting a miss if there is none"""
+        best_key, best_distance = None, self.max_distance + 1
+        with self._lock:
+            candidates = list(self._phashes.items()) if phash is not None else []
+        for key, other in candidates:
+            distance = (phash ^ other).bit_count()
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+
+        if best_key is not None:
+            description = self._cache.get(("description", best_key))
+            if description is not None:
+                with self._lock:
+                    self.near_hits += 1
+                return description
+            # the entry expired or was evicted, forget its hash too
+            with self._lock:
+                self._phashes.pop(best_key, None)
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, content_key: str, phash: Optional[int], description: str):
+        self._cache.set(("description", content_key), description, expire=self.ttl_seconds)
+        if phash is not None:
+            self._cache.set(("phash", content_key), phash, expire=self.ttl_seconds)
+            with self._lock:
+                self._phashes[content_key] = phash
+
+    def stats(self) -> Dict:
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "lookups": lookups,
+            "exact_hits": self.exact_hits,
+            "near_duplicate_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_rate": round((self.exact_hits + self.near_hits) / lookups, 3) if lookups else 0.0,
+            "entries": sum(1 for key in self._cache.iterkeys() if key[0] == "description"),
+            "perceptual_hashes": len(self._phashes),
+            "size_bytes": self._cache.volume(),
+        }
+
+
+description_cache = DescriptionCache(
+    DESCRIPTION_CACHE_DIR, DESCRIPTION_CACHE_TTL, DESCRIPTION_CACHE_MAX_BYTES
+)
+
+
+DESCRIPTION_PROMPT = (
+    """
+    Analyze this image in detail. Provide a concise, one-paragraph description.
+    If it is a famous landmark, work of art, or specific location, identify it by name 
+    Focus on the most important and defining elements in the image that would be useful for a websearch
+    Forexample. instead of a 'a building' say, 'the eiffel tower in paris'
+    Do not add any conversation filler, return only the description
+    """ 
+)
+
+
+# one Gemini client for the life of the server, created on first use so that
+# starting the server does not pay for it; its HTTP connections are reused
+_genai_client: Optional[genai.Client] = None
+_genai_client_lock = threading.Lock()
+
+# how many vision calls describe_images runs at the same time
+VISION_MAX_CONCURRENCY = int(os.environ.get("VISION_MAX_CONCURRENCY", 4))
+
+
+def get_genai_client() -> genai.Client:
+    global _genai_client
+    if _genai_client is None:
+        with _genai_client_lock:
+            if _genai_client is None:
+                _genai_client = genai.Client(api_key="{{GOOGLE_GEMINI_API_KEY}}")
+    return _genai_client
+
+
+def describe_image_bytes(image_bytes: bytes, mime_type: str) -> str:
+    """Sends image bytes to the Gemini vision model and returns its description"""
+    image_part = types.Part.from_bytes(
+        mime_type=mime_type, 
+        data=image_bytes
+    )
+
+    response = get_genai_client().models.generate_content(
+        model='gemini-2.5-flash',
+        contents=[image_part, DESCRIPTION_PROMPT]
+    )
+
+    return response.text.strip()
+
+
+def _describe_entry(entry: Dict) -> str:
+    # the same or a near-identical image may have been described before
+    image_handle = entry["image_handle"]
+    source = "cache"
+    description = description_cache.get(image_handle)
+    if description is None:
+        phash = perceptual_hash(entry["data"])
+        description = description_cache.find_similar(phash)
+        source = "near-duplicate cache entry"
+        if description is None:
+            # downscale and recompress before the bytes leave the server
+            image_bytes, mime_type = prepare_image_for_vision(entry["data"], entry["mime_type"])
+            description = describe_image_bytes(image_bytes, mime_type)
+            source = "vision model"
+        # also store near-duplicate hits under this exact image, so the next lookup is exact
+        description_cache.put(image_handle, phash, description)
+
+    # the full cache stats scan every key, so they are only computed on demand by description_cache_stats
+    logger.debug("Description of %s came from the %s", image_handle, source)
+    return description
+
+
+def _unknown_handle_message(image_handle: str) -> str:
+    return (
+        f"Error: Unknown or expired image handle '{image_handle}'. "
+        "Load the image again with load_image_from_path"
+    )
+
+
 @mcp.tool()
-def get_image_description(base64_image_string: str, mime_type: str) -> str: 
+def get_image_description(image_handle: str) -> str: 
     """
-    Performs a deep analysis of a Base64 encoded image and returns a detailed, 
+    Performs a deep analysis of a loaded image and returns a detailed, 
     descriptive paragraph about its content. If the image is of a known landmark,
     it will be specifically identified. This description is intended to be used as 
     a high-quality search query for  a research tool.
 
     Args: 
-        base64_image_string: The image file encoded as a Base64 string 
-        mime_type: The MIME type of the image (e.g. 'image/jpeg', 'image/png')
+        image_handle: The handle returned by load_image_from_path (e.g. 'img_3f2a9c0d1b7e4a56')
 
     Returns:
         A single string containing a detailed description of the image. 
         Returns an error message if analysis fails
     """
     try: 
-        image_bytes = base64.b64encode(base64_image_string)
+        entry = image_store.get(image_handle)
+        if entry is None:
+            return _unknown_handle_message(image_handle)
 
-        image_part = types.Part.from_bytes(
-            mime_type=mime_type, 
-            data=image_bytes
-        )
+        return _describe_entry(entry)
+    
+    except Exception as e: 
+        return f"Error analyzing image: {e}"
 
-        prompt_text = (
-            """
-            Analyze this image in detail. Provide a concise, one-paragraph description.
-            If it is a famous landmark, work of art, or specific location, identify it by name 
-            Focus on the most important and defining elements in the image that would be useful for a websearch
-            Forexample. instead of a 'a building' say, 'the eiffel tower in paris'
-            Do not add any conversation filler, return only the description
-            """ 
-        )
-        model = genai.Client(
-            'gemini-2.5-flash', 
-            google_api_key="{{GOOGLE_GEMINI_API_KEY}}"
-        )
 
-        response = model.generate_content([image_part, prompt_text])
+@mcp.tool()
+async def describe_images(images: List[str]) -> List[Dict[str, str]]:
+    """
+    Describes several images at once, analyzing them concurrently. Use this instead of
+    calling get_image_description repeatedly when the user asks about more than one image
+    (e.g. 'what are these 10 photos?').
 
-        description = response.text.strip()
+    Args:
+        images: Image handles returned by load_image_from_path, or server-accessible
+                image file paths (which are loaded automatically)
+
+    Returns:
+        One dictionary per image, in the same order, with the 'image' it refers to and
+        either its 'description' or an 'error' if that image could not be analyzed
+    """
+    semaphore = asyncio.Semaphore(VISION_MAX_CONCURRENCY)
+
+    def describe_one(image: str) -> Dict[str, str]:
+        # a file may well be named like a handle (img_0042.jpg), so the store is checked first
+        entry = image_store.get(image)
+        if entry is None:
+            if image.startswith("img_") and not os.path.exists(image):
+                return {"image": image, "error": _unknown_handle_message(image)}
+            entry = _load_image(image)
+        return {"image": image, "description": _describe_entry(entry)}
+
+    async def run(image: str) -> Dict[str, str]:
+        # a failure only affects its own image, the rest of the batch still completes
+        try:
+            async with semaphore:
+                return await asyncio.to_thread(describe_one, image)
+        except FileNotFoundError:
+            return {"image": image, "error": f"File not found at path: {image}"}
+        except Exception as e:
+            return {"image": image, "error": f"Error analyzing image: {e}"}
+
+    return await asyncio.gather(*(run(image) for image in images))
+
+
+@mcp.resource("stats://description_cache")
+def description_cache_stats() -> dict:
+    """
+    Hit rates, entry count and on-disk size of the image description cache
+    """
+    return description_cache.stats()
 
-        return description 
-    
-    except Exception as e: 
-        return f"Error analyzing image: {e}"
 
+if __name__ == "__main__":
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
 
-        
\ No newline at end of file
+    # the server will run and listen for requests from the client over stdio,
+    # or over streamable HTTP with --transport streamable-http
+    run_server(mcp, default_port=8004)
@@ -0,0 +1,200 @@
+import argparse
+import bz2
+import gzip
+import re
+import sqlite3
+import threading
+import time
+import xml.etree.ElementTree as ET
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# abstracts dumps prefix every title with the site name, e.g. "Wikipedia: Eiffel Tower"
+TITLE_PREFIX = re.compile(r"^Wikipedia:\s*")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS articles (
+    id INTEGER PRIMARY KEY,
+    title_key TEXT NOT NULL UNIQUE,
+    title TEXT NOT NULL,
+    summary TEXT NOT NULL,
+    url TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+    title, summary, content='articles', content_rowid='id', tokenize='porter unicode61'
+);
+"""
+
+
+def title_key(title: str) -> str:
+    """Normalized form of a title used for exact and prefix lookups"""
+    return " ".join(title.replace("_", " ").lower().split())
+
+
+def _open_dump(path: str):
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".bz2"):
+        return bz2.open(path, "rb")
+    return open(path, "rb")
+
+
+def iter_abstracts(dump_path: str) -> Iterator[Tuple[str, str, str]]:
+    """
+    Streams (title, first paragraph, url) triples out of a Wikipedia abstracts dump
+    (e.g. enwiki-latest-abstract.xml.gz) without loading it into memory
+    """
+    with _open_dump(dump_path) as f:
+        for _, element in ET.iterparse(f, events=("end",)):
+            if element.tag != "doc":
+                continue
+            title = TITLE_PREFIX.sub("", element.findtext("title") or "").strip()
+            abstract = (element.findtext("abstract") or "").strip().split("\n")[0]
+            url = (element.findtext("url") or "").strip()
+            # free the parsed subtree, the dump has millions of documents
+            element.clear()
+            if title and abstract and url:
+                yield title, abstract, url
+
+
+def build_index(dump_path: str, index_path: str, batch_size: int = 10_000) -> int:
+    """
+    Builds the on-disk index (title, first paragraph, URL) from an abstracts dump.
+
+    Returns:
+        The number of articles indexed
+    """
+    connection = sqlite3.connect(index_path)
+    connection.executescript(SCHEMA)
+    # the index is written once and then only read, so favour build speed
+    connection.execute("PRAGMA journal_mode=OFF")
+    connection.execute("PRAGMA synchronous=OFF")
+
+    count = 0
+    batch: List[Tuple[str, str, str, str]] = []
+
+    def flush():
+        connection.executemany(
+            "INSERT OR IGNORE INTO articles (title_key, title, summary, url) VALUES (?, ?, ?, ?)", batch
+        )
+        connection.commit()
+        batch.clear()
+
+    for title, summary, url in iter_abstracts(dump_path):
+        batch.append((title_key(title), title, summary, url))
+        count += 1
+        if len(batch) >= batch_size:
+            flush()
+            print(f"indexed {count} articles...")
+    flush()
+
+    # the full-text index is an external-content table over articles, built in one pass
+    connection.execute("INSERT INTO articles_fts (articles_fts) VALUES ('rebuild')")
+    connection.execute("INSERT INTO articles_fts (articles_fts) VALUES ('optimize')")
+    connection.commit()
+    connection.execute("VACUUM")
+    connection.close()
+    return count
+
+
+class LocalWikipediaIndex:
+    """
+    Read-only lookups against an index built by build_index: exact title, title
+    prefix and full-text search over titles and first paragraphs.
+
+    Each thread gets its own read-only SQLite connection, so the index can be queried
+    from the Wikipedia server's page pool.
+    """
+    def __init__(self, index_path: str):
+        self.index_path = index_path
+        self._local = threading.local()
+        # fail at startup rather than on the first lookup if the index is missing
+        self._connection()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(f"file:{self.index_path}?mode=ro", uri=True, check_same_thread=False)
+            self._local.connection = connection
+        return connection
+
+    def get(self, title: str) -> Optional[Dict[str, Any]]:
+        """Returns the article with exactly this (normalized) title, if any"""
+        row = self._connection().execute(
+            "SELECT title, summary, url FROM articles WHERE title_key = ?", (title_key(title),)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"title": row[0], "summary": row[1], "url": row[2]}
+
+    def search(self, query: str, limit: int = 1) -> List[str]:
+        """
+        Returns up to `limit` matching titles: the exact title first, then titles
+        starting with the query (shortest first), then full-text matches ranked by bm25
+        """
+        connection = self._connection()
+        key = title_key(query)
+        titles: List[str] = []
+
+        def add(rows):
+            for (title,) in rows:
+                if title not in titles and len(titles) < limit:
+                    titles.append(title)
+
+        add(connection.execute("SELECT title FROM articles WHERE title_key = ?", (key,)))
+
+        if len(titles) < limit and key:
+            # a range scan on the unique title_key index is a prefix search; only a
+            # bounded number of candidates is ranked so short prefixes stay fast
+            add(connection.execute(
+                "SELECT title FROM ("
+                "SELECT title, title_key FROM articles WHERE title_key > ? AND title_key < ? LIMIT 200"
+                ") ORDER BY length(title_key) LIMIT ?",
+                (key, key + "\uffff", limit),
+            ))
+
+        terms = re.findall(r"\w+", query)
+        if len(titles) < limit and terms:
+            match = " ".join(f'"{term}"' for term in terms)
+            add(connection.execute(
+                "SELECT a.title FROM articles_fts "
+                "JOIN articles a ON a.id = articles_fts.rowid "
+                "WHERE articles_fts MATCH ? ORDER BY bm25(articles_fts) LIMIT ?",
+                (match, limit),
+            ))
+
+        return titles
+
+
+def benchmark(index_path: str, queries: List[str], rounds: int = 1000):
+    index = LocalWikipediaIndex(index_path)
+    print(f"\nLocal Wikipedia index lookups ({rounds} rounds per query)")
+    print("---"*20)
+    for query in queries:
+        start = time.perf_counter()
+        for _ in range(rounds):
+            titles = index.search(query, limit=5)
+            for title in titles:
+                index.get(title)
+        elapsed = (time.perf_counter() - start) / rounds
+        print(f"{query!r:<30} {1000 * elapsed:8.3f} ms per search + {len(titles)} page lookups")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or benchmark the offline Wikipedia summary index")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Build the index from an abstracts dump")
+    build.add_argument("dump", help="e.g. enwiki-latest-abstract.xml.gz from dumps.wikimedia.org")
+    build.add_argument("--index", default="wikipedia_abstracts.sqlite")
+
+    bench = commands.add_parser("bench", help="Measure lookup latency")
+    bench.add_argument("queries", nargs="+")
+    bench.add_argument("--index", default="wikipedia_abstracts.sqlite")
+
+    args = parser.parse_args()
+    if args.command == "build":
+        start = time.perf_counter()
+        total = build_index(args.dump, args.index)
+        print(f"Indexed {total} articles into {args.index} in {time.perf_counter() - start:.0f}s")
+    else:
+        benchmark(args.index, args.queries)
@@ -1,10 +1,87 @@
 import wikipedia 
-from typing import List, Dict, Any
+import os
+import sys
+import diskcache
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List, Dict, Any, Optional
 from mcp.server.fastmcp import FastMCP 
 
+# the transport helper lives at the repository root, next to the other MCP servers
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from mcp_http_transport import run_server
+from wikipedia_local_index import LocalWikipediaIndex
+
 # initialize the fastmcp server
 mcp = FastMCP("WikipediaResearchServer")
 
+# 'live' queries wikipedia.org, 'local' answers from an offline index built with
+#   python wikipedia_local_index.py build enwiki-latest-abstract.xml.gz
+WIKIPEDIA_BACKEND = os.environ.get("WIKIPEDIA_BACKEND", "live")
+WIKIPEDIA_INDEX_PATH = os.environ.get(
+    "WIKIPEDIA_INDEX_PATH", str(Path(__file__).resolve().parent / "wikipedia_abstracts.sqlite")
+)
+local_index = LocalWikipediaIndex(WIKIPEDIA_INDEX_PATH) if WIKIPEDIA_BACKEND == "local" else None
+
+# pages are fetched concurrently, a bounded pool keeps us polite towards Wikipedia
+WIKIPEDIA_MAX_WORKERS = int(os.environ.get("WIKIPEDIA_MAX_WORKERS", 5))
+page_pool = ThreadPoolExecutor(max_workers=WIKIPEDIA_MAX_WORKERS, thread_name_prefix="wikipedia")
+
+# search results and page summaries are cached on disk across server restarts;
+# search rankings change more often than article introductions
+WIKIPEDIA_CACHE_DIR = os.environ.get(
+    "WIKIPEDIA_CACHE_DIR", str(Path(__file__).resolve().parent / ".wikipedia_cache")
+)
+SEARCH_CACHE_TTL = int(os.environ.get("WIKIPEDIA_SEARCH_CACHE_TTL", 24 * 3600))
+SUMMARY_CACHE_TTL = int(os.environ.get("WIKIPEDIA_SUMMARY_CACHE_TTL", 7 * 24 * 3600))
+wikipedia_cache = diskcache.Cache(WIKIPEDIA_CACHE_DIR, size_limit=100 * 1024 * 1024)
+
+
+def search_titles(query: str, num_articles: int) -> List[str]:
+    """Returns the top matching page titles for a query, using the search cache"""
+    if local_index is not None:
+        return local_index.search(query, limit=num_articles)
+
+    key = ("search", query.strip().lower(), num_articles)
+    titles = wikipedia_cache.get(key)
+    if titles is None:
+        titles = wikipedia.search(query, results=num_articles)
+        wikipedia_cache.set(key, titles, expire=SEARCH_CACHE_TTL)
+    return titles
+
+
+def fetch_page_summary(title: str) -> Optional[Dict[str, Any]]:
+    """
+    Returns the title, first paragraph and URL of a page, using the summary cache.
+    Disambiguation and missing pages return None and are cached as such, so they
+    are not refetched just to be skipped again.
+    """
+    if local_index is not None:
+        return local_index.get(title)
+
+    key = ("page", title)
+    cached = wikipedia_cache.get(key)
+    if cached is not None:
+        return cached.get("article")
+
+    try:
+        # retrieve the page object for the title
+        page = wikipedia.page(title, auto_suggest=False)
+        article = {
+            "title": page.title, 
+            "summary": page.summary.split("\n")[0], # get the first paragraph as brief summary
+            "url": page.url
+        }
+    except wikipedia.DisambiguationError:
+        # If a title is ambiguous, we'll just skip it
+        article = None
+    except wikipedia.PageError:
+        # If a specific page fails to load, skip it 
+        article = None
+
+    wikipedia_cache.set(key, {"article": article}, expire=SUMMARY_CACHE_TTL)
+    return article
+
 @mcp.tool()
 def fetch_wikipedia_info(query: str, num_articles: int = 1) -> List[Dict[str, Any]]:
     """
@@ -20,7 +97,7 @@ def fetch_wikipedia_info(query: str, num_articles: int = 1) -> List[Dict[str, An
     """
     try:
         # Get a list of potential page titles from the search
-        search_results = wikipedia.search(query, results=num_articles)
+        search_results = search_titles(query, num_articles)
         if not search_results:
             return [
                 {
@@ -28,23 +105,13 @@ def fetch_wikipedia_info(query: str, num_articles: int = 1) -> List[Dict[str, An
                 }
             ]
         
-        articles_info = []
-        for title  in search_results:
-            try:
-                # retrieve the page object for each title
-                page = wikipedia.page(title, auto_suggest=False)
-                articles_info.append({
-                    "title": page.title, 
-                    "summary": page.summary.split("\n")[0], # get the first paragraph as brief summary
-                    "url": page.url
-
-                })
-            except wikipedia.DisambiguationError:
-                # If a title is ambiguous, we'll just skip it and try the next one
-                continue
-            except wikipedia.PageError:
-                # If a specific page fails to load, skip it 
-                continue
+        # retrieve all pages concurrently, keeping the search ranking order;
+        # local lookups are sub-millisecond and skip the pool
+        fetch = map if local_index is not None else page_pool.map
+        articles_info = [
+            article for article in fetch(fetch_page_summary, search_results)
+            if article is not None
+        ]
         
         if not articles_info:
             return [
@@ -58,3 +125,9 @@ def fetch_wikipedia_info(query: str, num_articles: int = 1) -> List[Dict[str, An
                 "error": f"An unexpected error occured: {str(e)}"
             }
         ]
+
+
+if __name__ == "__main__":
+    # the server will run and listen for requests from the client over stdio,
+    # or over streamable HTTP with --transport streamable-http
+    run_server(mcp, default_port=8005)
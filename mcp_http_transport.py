@@ -0,0 +1,126 @@
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+from mcp.server.fastmcp import FastMCP
+from langchain_mcp_adapters.sessions import create_session
+
+
+def run_server(mcp: FastMCP, default_port: int):
+    """
+    Runs a FastMCP server over stdio (the default) or as a long-lived
+    streamable-HTTP server that many clients can share.
+
+    The transport can be picked on the command line or through environment variables:
+        python task_server.py --transport streamable-http --port 8001
+        MCP_TRANSPORT=streamable-http MCP_PORT=8001 python task_server.py
+
+    Args:
+        mcp: The FastMCP server to run
+        default_port: Port used in HTTP mode when none is given
+    """
+    parser = argparse.ArgumentParser(description=f"Run the {mcp.name} MCP server")
+    parser.add_argument(
+        "--transport",
+        choices=["stdio", "streamable-http"],
+        default=os.environ.get("MCP_TRANSPORT", "stdio"),
+        help="stdio spawns one private server per client, streamable-http serves many clients from one process",
+    )
+    parser.add_argument("--host", default=os.environ.get("MCP_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("MCP_PORT", default_port)))
+    args = parser.parse_args()
+
+    if args.transport == "streamable-http":
+        # uvicorn serves the streamable-HTTP app at http://<host>:<port>/mcp
+        mcp.settings.host = args.host
+        mcp.settings.port = args.port
+        print(f"Serving {mcp.name} at http://{args.host}:{args.port}{mcp.settings.streamable_http_path}")
+
+    mcp.run(transport=args.transport)
+
+
+async def _session_cycle(url: str) -> float:
+    start = time.perf_counter()
+    async with create_session({"transport": "streamable_http", "url": url}) as session:
+        await session.initialize()
+        await session.list_tools()
+    return time.perf_counter() - start
+
+
+async def load_test(url: str, sessions: int = 200, concurrency: int = 20, held_sessions: int = 50,
+                    server_pid: int | None = None):
+    """
+    Load tests one warm streamable-HTTP server.
+
+    Reports how many client sessions per second it can open, initialize and serve a
+    list_tools call for, and (when the server pid is given) the server's resident memory
+    growth per concurrently held session.
+
+    Args:
+        url: Server endpoint, e.g. http://127.0.0.1:8001/mcp
+        sessions: Total number of short-lived sessions to run
+        concurrency: Number of sessions in flight at once
+        held_sessions: Number of sessions held open at once for the memory measurement
+        server_pid: Process id of the server, used to read its memory usage
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def bounded_cycle():
+        async with semaphore:
+            return await _session_cycle(url)
+
+    # warm up the server before measuring
+    await _session_cycle(url)
+
+    start = time.perf_counter()
+    latencies = sorted(await asyncio.gather(*(bounded_cycle() for _ in range(sessions))))
+    elapsed = time.perf_counter() - start
+
+    print(f"\nLoad test against {url}")
+    print("---"*20)
+    print(f"sessions:           {sessions} ({concurrency} concurrent)")
+    print(f"throughput:         {sessions / elapsed:.1f} sessions/sec")
+    print(f"latency p50:        {1000 * statistics.median(latencies):.1f} ms")
+    print(f"latency p95:        {1000 * latencies[int(0.95 * (len(latencies) - 1))]:.1f} ms")
+
+    if server_pid is None:
+        return
+
+    import psutil
+    server = psutil.Process(server_pid)
+    baseline_rss = server.memory_info().rss
+
+    # hold sessions open concurrently and see how much the one server process grows
+    release = asyncio.Event()
+    opened = 0
+
+    async def hold_session():
+        nonlocal opened
+        async with create_session({"transport": "streamable_http", "url": url}) as session:
+            await session.initialize()
+            opened += 1
+            await release.wait()
+
+    holders = [asyncio.create_task(hold_session()) for _ in range(held_sessions)]
+    while opened < held_sessions and not all(task.done() for task in holders):
+        await asyncio.sleep(0.05)
+    held_rss = server.memory_info().rss
+    release.set()
+    await asyncio.gather(*holders, return_exceptions=True)
+
+    print(f"server memory:      {baseline_rss / 2**20:.1f} MiB idle, {held_rss / 2**20:.1f} MiB with {opened} sessions")
+    print(f"memory per session: {(held_rss - baseline_rss) / max(opened, 1) / 1024:.1f} KiB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test a streamable-HTTP MCP server")
+    parser.add_argument("url", help="Server endpoint, e.g. http://127.0.0.1:8001/mcp")
+    parser.add_argument("--sessions", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--held-sessions", type=int, default=50)
+    parser.add_argument("--pid", type=int, default=None, help="Server process id, to report memory per session")
+    args = parser.parse_args()
+
+    asyncio.run(load_test(args.url, args.sessions, args.concurrency, args.held_sessions, args.pid))
@@ -1,6 +1,4 @@
 import asyncio 
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import AnyMessage, add_messages
@@ -12,12 +10,30 @@ from typing_extensions import TypedDict
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-from langchain_mcp_adapters.tools import load_mcp_tools 
+from langchain_mcp_adapters.prompts import load_mcp_prompt
+from langchain_mcp_adapters.resources import load_mcp_resources
+from langchain_core.messages import AIMessage, HumanMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from collections import Counter
+import json
+import math
+import re
 import shlex
+import sys
+import time
 
 # Import the MultiServerMCPClient 
 from langchain_mcp_adapters.client import MultiServerMCPClient
 
+# one long-lived session per server, shared by tools, prompts and resources
+from mcp_session_pool import MCPSessionPool, ServerToolCatalog, ainput, normalize_server_config
+
+# keeps the resent history within a token budget
+from conversation_history import HistoryManager
+
+# conversations survive restarts when CHECKPOINT_BACKEND=sqlite is set
+from checkpointing import create_checkpointer, close_checkpointer
+
 # --- Multi-server configuration dictionary ----
 # This dictionary defines all the servers the client will connect to 
 server_configs = {
@@ -33,42 +49,49 @@ server_configs = {
     }
 }
 
+# To share one warm server between many clients, start it once with
+#   python mcp_multi_server_task_server.py --transport streamable-http --port 8001
+# and point the config at its URL instead, e.g. "tasks": "http://127.0.0.1:8001/mcp"
+
 
-async def list_prompts(client: MultiServerMCPClient, server_configs:dict):
+async def list_prompts(pool: MCPSessionPool, server_configs:dict):
     print("\nAvailable prompts from all servers:")
     print("----"*20)
 
     any_prompts_found = False 
 
-    # Iterate through the names of the servers defined in your server_configs
+    # query every server concurrently; a slow or dead server does not hold up the others
+    responses, errors = await pool.fan_out(
+        lambda session: session.list_prompts(), server_names=server_configs.keys()
+    )
+
+    # print in the order of server_configs so the listing is stable
     for server_name in server_configs.keys():
-        try:
-            # opening a session for a specific server to interact with its prompts
-            async with client.session(server_name) as session:
-                prompt_response = await session.list_prompts()
-
-                if prompt_response and prompt_response.prompts:
-                    any_prompts_found = True 
-
-                    # print a header for the server to group the prompts 
-                    print("f\n---Server: '{server_name}'---")
-
-                    for p in prompt_response.prompts:
-                        print(f"    Prompt: {p.name}")
-                        if p.arguments:
-                            arg_list = [f"{arg.name}" for arg in p.arguments]
-                            print("f   Arguments: {','.join(arg_list)}")
-                        else:
-                            print("     Arguments: None")
-        except Exception as e:
-            print(f"\nCould not fetch prompts from the server '{server_name}': {e}")
+        prompt_response = responses.get(server_name)
+
+        if prompt_response and prompt_response.prompts:
+            any_prompts_found = True 
+
+            # print a header for the server to group the prompts 
+            print(f"\n---Server: '{server_name}'---")
+
+            for p in prompt_response.prompts:
+                print(f"    Prompt: {p.name}")
+                if p.arguments:
+                    arg_list = [f"{arg.name}" for arg in p.arguments]
+                    print(f"    Arguments: {','.join(arg_list)}")
+                else:
+                    print("     Arguments: None")
+
+    for server_name, e in errors.items():
+        print(f"\nCould not fetch prompts from the server '{server_name}': {e}")
         
-        print("\nUse: /prompt <server_name> <prompt_name> \"arg1\" \"arg2\" ......")
-        print("---"*14)
-        if not any_prompts_found:
-            print("\nNo prompts were found on any connected servers")
+    print("\nUse: /prompt <server_name> <prompt_name> \"arg1\" \"arg2\" ......")
+    print("---"*14)
+    if not any_prompts_found:
+        print("\nNo prompts were found on any connected servers")
 
-async def handle_prompt(client: MultiServerMCPClient, command: str) -> str | None: 
+async def handle_prompt(pool: MCPSessionPool, command: str) -> str | None: 
     try:
         # Use shlex to correctly parse arguments, even with spaces 
         parts = shlex.split(command.strip())
@@ -84,11 +107,11 @@ async def handle_prompt(client: MultiServerMCPClient, command: str) -> str | Non
 
         # --- validate the prompt and arguments against the specific server ----
         prompt_def = None 
-        async  with client.session(server_name) as session:
-            all_prompts_resp = await session.list_prompts()
-            if all_prompts_resp and all_prompts_resp.prompts:
-                # find the matching prompt definition
-                prompt_def = next((p for p in all_prompts_resp.prompts if p.name == prompt_name), None)
+        session = pool.session(server_name)
+        all_prompts_resp = await session.list_prompts()
+        if all_prompts_resp and all_prompts_resp.prompts:
+            # find the matching prompt definition
+            prompt_def = next((p for p in all_prompts_resp.prompts if p.name == prompt_name), None)
         
         if not prompt_def:
             print("\nError: Prompt '{prompt_name}' not found on server '{server_name}'")
@@ -104,10 +127,10 @@ async def handle_prompt(client: MultiServerMCPClient, command: str) -> str | Non
         # fetch adn execute the prompt
         arg_dict = {arg.name: val for arg, val in zip(prompt_def.arguments, user_args)}
 
-        # use the client's get_prompt method, specifying server, prompt and args
-        prompt_messages = await client.get_prompt(
-            server_name = server_name, 
-            prompt_name = prompt_name, 
+        # fetch the prompt over the same session used to validate it 
+        prompt_messages = await load_mcp_prompt(
+            session, 
+            prompt_name, 
             arguments = arg_dict
         )
 
@@ -123,30 +146,31 @@ async def handle_prompt(client: MultiServerMCPClient, command: str) -> str | Non
         print(f"\nAn error occurred during prompt invocation: {e}")
 
 
-async def list_resources(client: MultiServerMCPClient, server_configs: dict):
+async def list_resources(pool: MCPSessionPool, server_configs: dict):
     print("\nAvailable Resources from all servers")
     print("--"*20)
 
     any_resources_found=False 
 
-    # Iterate through the names of the servers defined in your server_configs
+    # query every server concurrently; a slow or dead server does not hold up the others
+    responses, errors = await pool.fan_out(
+        lambda session: session.list_resources(), server_names=server_configs.keys()
+    )
+
     for server_name in server_configs.keys():
-        try:
-            # opening a session for a specific server to list its resources
-            async with client.session(server_name) as session:
-                # the method to list resources is session.list_resources()
-                resource_response = await session.list_resources() 
-
-                if resource_response and resource_response.resources:
-                    any_resources_found = True 
-                    print("\n----Server: '{server_name}'")
-                    for r in resource_response.resources:
-                        # the most important identifier for a resource is its uri 
-                        print(f"    Description: {r.uri}")
-                        if r.description:
-                            print(f"    Description: {r.description}")
-        except Exception as e:
-            print(f"\nCould not fetch resources from server: '{server_name}': {e}")   
+        resource_response = responses.get(server_name)
+
+        if resource_response and resource_response.resources:
+            any_resources_found = True 
+            print(f"\n----Server: '{server_name}'")
+            for r in resource_response.resources:
+                # the most important identifier for a resource is its uri 
+                print(f"    Resource URI: {r.uri}")
+                if r.description:
+                    print(f"    Description: {r.description}")
+
+    for server_name, e in errors.items():
+        print(f"\nCould not fetch resources from server: '{server_name}': {e}")   
 
     print("\nUse: /resource <server_name> <resource_uri>") 
     print("---"*10)
@@ -154,7 +178,7 @@ async def list_resources(client: MultiServerMCPClient, server_configs: dict):
     if not any_resources_found:
         print("\nNo resources were found on any connected servers.")                
 
-async def handle_resource(client: MultiServerMCPClient, command: str) -> str | None:
+async def handle_resource(pool: MCPSessionPool, command: str) -> str | None:
     try:
         parts = command.strip().split() 
         if len(parts) != 3:
@@ -166,8 +190,8 @@ async def handle_resource(client: MultiServerMCPClient, command: str) -> str | N
 
         print(f"\n---Fetching resource '{resource_uri}' from server '{server_name}'...----")
 
-        # It requires the server_name and the URI of the resource 
-        blobs = await client.get_resources(server_name=server_name, uris=[resource_uri])
+        # It requires the server's session and the URI of the resource 
+        blobs = await load_mcp_resources(pool.session(server_name), uris=[resource_uri])
 
         if not blobs: 
             print("Error: Resource not found or content is empty")
@@ -184,14 +208,102 @@ async def handle_resource(client: MultiServerMCPClient, command: str) -> str | N
         return None
    
 
+# words that carry no signal when matching a request against tool descriptions
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how", "i", "in", "is",
+    "it", "me", "my", "of", "on", "or", "please", "the", "this", "to", "what", "with", "you", "your",
+}
+
+def _tokenize(text: str) -> List[str]:
+    terms = []
+    for term in re.findall(r"[a-z0-9]+", text.lower()):
+        if term in STOPWORDS:
+            continue
+        # crude plural folding so 'tasks' matches 'task'
+        if len(term) > 3 and term.endswith("s"):
+            term = term[:-1]
+        terms.append(term)
+    return terms
+
+
+class ToolSelector:
+    """
+    BM25 index over tool names and descriptions.
+
+    Picks the top-k tools relevant to the current user message so only their schemas
+    are bound to the LLM for the turn. Falls back to the full tool set when nothing
+    matches, so the model is never left without a tool it may need.
+    """
+    def __init__(self, tools: list, top_k: int = 4, k1: float = 1.5, b: float = 0.75):
+        self.tools = tools
+        self.top_k = top_k
+        self.k1 = k1
+        self.b = b
+
+        # tool names are snake_case, split them so 'add_task' indexes as 'add task'
+        self._docs = [
+            Counter(_tokenize(f"{tool.name.replace('_', ' ')} {tool.description or ''}"))
+            for tool in tools
+        ]
+        self._doc_lengths = [sum(doc.values()) for doc in self._docs]
+        self._avg_length = (sum(self._doc_lengths) / len(self._docs)) if self._docs else 0.0
+
+        document_frequency = Counter(term for doc in self._docs for term in doc)
+        n = len(self._docs)
+        self._idf = {
+            term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in document_frequency.items()
+        }
+
+        # approximate schema size (~4 characters per token) of each tool, for reporting savings
+        self._schema_tokens = {
+            tool.name: len(json.dumps(convert_to_openai_tool(tool))) // 4 for tool in tools
+        }
+
+    def _score(self, query_terms: List[str], index: int) -> float:
+        doc = self._docs[index]
+        length_norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[index] / (self._avg_length or 1))
+        score = 0.0
+        for term in set(query_terms):
+            tf = doc.get(term, 0)
+            if tf:
+                score += self._idf[term] * tf * (self.k1 + 1) / (tf + length_norm)
+        return score
+
+    def select(self, query: str, always_include: set = frozenset()) -> list:
+        """
+        Returns the tools to bind for a query.
+
+        Args:
+            query: The current user message
+            always_include: Names of tools that must stay bound, e.g. tools already called this turn
+        """
+        if not self.top_k or self.top_k >= len(self.tools):
+            return list(self.tools)
+
+        query_terms = _tokenize(query)
+        scored = [(self._score(query_terms, i), i) for i in range(len(self.tools))]
+        ranked = [i for score, i in sorted(scored, key=lambda item: -item[0]) if score > 0]
+
+        # nothing matched lexically: fall back to the full tool set
+        if not ranked:
+            return list(self.tools)
+
+        chosen = set(ranked[:self.top_k])
+        chosen.update(i for i, tool in enumerate(self.tools) if tool.name in always_include)
+        # keep the original tool order so the bound payload is stable between calls
+        return [tool for i, tool in enumerate(self.tools) if i in chosen]
+
+    def schema_tokens(self, tools: list) -> int:
+        return sum(self._schema_tokens.get(tool.name, 0) for tool in tools)
+
+
 # langgraph state definition
 class State(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
+    # running summary of the turns dropped from messages
+    summary: str
 
-async def create_graph(session):
-    # load tools from MCP server
-    tools = await load_mcp_tools(session)
-
+def create_graph(tools: list, checkpointer=None, top_k: int = 4):
     # LLM configuration
     llm = ChatGoogleGenerativeAI(
         model="gemini-2.0-flash",
@@ -199,20 +311,44 @@ async def create_graph(session):
         google_api_key="GOOGLE API KEY"
     )
 
-    llm_with_tools = llm.bind_tools(tools)
+    # only the tools relevant to the current message are bound on each turn
+    selector = ToolSelector(tools, top_k=top_k)
+    full_schema_tokens = selector.schema_tokens(tools)
 
-    # prompt template with user/assistant chat only
+    # prompt template with the system instructions followed by the conversation
     prompt_template = ChatPromptTemplate.from_messages([
         ("system", "you're a helpful assistant. You have access to tools for checking the weather and managing a to-do list.\
-         Use the tools when necessary based on the user's request")
+         Use the tools when necessary based on the user's request"),
+        MessagesPlaceholder("messages")
     ])
 
-    chat_llm = prompt_template | llm_with_tools
+    # loaded resources, tool outputs and old turns are kept within a token budget
+    history = HistoryManager(llm)
 
     # define chat node
     def chat_node(state: State) -> State: 
+       messages = state["messages"]
+
+       # the current user message, and any tools already called since it was sent
+       query, called_tools = "", set()
+       for message in reversed(messages):
+           if isinstance(message, HumanMessage):
+               query = message.content if isinstance(message.content, str) else str(message.content)
+               break
+           if isinstance(message, AIMessage):
+               called_tools.update(call["name"] for call in message.tool_calls)
+
+       selected_tools = selector.select(query, always_include=called_tools)
+       bound_tokens = selector.schema_tokens(selected_tools)
+       print(
+           f"[tools] bound {len(selected_tools)}/{len(tools)} tools, "
+           f"~{bound_tokens} of ~{full_schema_tokens} schema tokens "
+           f"(saved ~{full_schema_tokens - bound_tokens})"
+       )
+
+       chat_llm = prompt_template | llm.bind_tools(selected_tools)
        response = chat_llm.invoke({
-           "messages": state["messages"]
+           "messages": history.context(state)
        })
        return {
            "messages": [response]
@@ -220,28 +356,107 @@ async def create_graph(session):
 
     # build langgraph with tool routing
     graph = StateGraph(State)
+    graph.add_node("history_node", history.node)
     graph.add_node("chat_node", chat_node)
     graph.add_node("tool_node", ToolNode(tools=tools))
-    graph.add_edge(START, "chat_node")
+    graph.add_edge(START, "history_node")
+    graph.add_edge("history_node", "chat_node")
     graph.add_conditional_edges("chat_node", tools_condition, {
         "tools": "tool_node",
         "__end__": END 
     })
     graph.add_edge("tool_node", "chat_node")
     
-    return graph.compile(checkpointer=MemorySaver())
-
-# Main function now uses MultiServerMCPClient
+    # a shared checkpointer keeps the conversation when the graph is rebuilt with new tools
+    return graph.compile(checkpointer=checkpointer or MemorySaver())
+
+async def benchmark_sessions(server_configs: dict, rounds: int = 5):
+    """
+    Compares startup and per-command latency of a fresh session per command
+    (MultiServerMCPClient.session) against the persistent session pool
+    """
+    def report(label, timings):
+        print(f"{label:<45} mean {1000 * sum(timings) / len(timings):8.1f} ms   max {1000 * max(timings):8.1f} ms")
+
+    print("\nBenchmarking MCP session handling")
+    print("---"*20)
+
+    # before: every command opens and initializes a brand new server session
+    client = MultiServerMCPClient(
+        {name: normalize_server_config(config) for name, config in server_configs.items()}
+    )
+    start = time.perf_counter()
+    await client.get_tools()
+    report("startup (client.get_tools)", [time.perf_counter() - start])
+
+    timings = []
+    for _ in range(rounds):
+        for server_name in server_configs.keys():
+            start = time.perf_counter()
+            async with client.session(server_name) as session:
+                await session.list_prompts()
+            timings.append(time.perf_counter() - start)
+    report("per command (session per command)", timings)
+
+    # after: one long-lived session per server
+    pool = MCPSessionPool(server_configs)
+    catalog = ServerToolCatalog(pool)
+    start = time.perf_counter()
+    await pool.start()
+    report("startup (parallel session pool + tools)", [time.perf_counter() - start])
+    for server_name, status in pool.startup_report().items():
+        if status["startup_time"] is not None:
+            report(f"  server '{server_name}' ({status['state']})", [status["startup_time"]])
+
+    start = time.perf_counter()
+    await catalog.refresh()
+    report("tool discovery (fan-out refresh)", [time.perf_counter() - start])
+
+    timings = []
+    for _ in range(rounds):
+        for server_name in server_configs.keys():
+            start = time.perf_counter()
+            await pool.session(server_name).list_prompts()
+            timings.append(time.perf_counter() - start)
+    report("per command (persistent session)", timings)
+
+    # listing every server one after another versus fanned out concurrently
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for server_name in server_configs.keys():
+            await pool.session(server_name).list_prompts()
+        timings.append(time.perf_counter() - start)
+    report("/prompts across servers (serial)", timings)
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        await pool.fan_out(lambda session: session.list_prompts())
+        timings.append(time.perf_counter() - start)
+    report("/prompts across servers (fan-out)", timings)
+
+    await pool.close()
+
+
+# Main function now keeps one persistent session per server
 async def main():
-    # As per the error message, instantiate the client directly 
-    # th eclient will manage the server subprocess internally 
-    client = MultiServerMCPClient(server_configs)
+    # the pool starts every server once and keeps its session initialized,
+    # reconnecting automatically if a server process dies
+    pool = MCPSessionPool(server_configs)
+
+    # the catalog collects each server's tools as soon as that server is ready
+    catalog = ServerToolCatalog(pool)
 
-    #get a single, unified list of tools from all connected servers
-    all_tools = await client.get_tools() 
+    # launch all servers concurrently and start serving as soon as one is ready
+    await pool.start(wait_for_all=False)
+    await pool.wait_for_any()
 
-    # create a langraph agent with the aggregated list of tools 
-    agent = create_graph(all_tools)
+    # create a langraph agent with the tools available so far; it is rebuilt
+    # (keeping the conversation) whenever a slower server comes online
+    checkpointer = await create_checkpointer()
+    agent_version = catalog.version
+    agent = create_graph(catalog.tools, checkpointer)
 
     print("MCP Agent is ready (connected to Weather and Task Servers)")
     # update the instruction for the user
@@ -255,17 +470,18 @@ async def main():
     message_to_agent = ""
     
     while True: 
-        user_input = input("\nYou: ").strip()
+        # reading input without blocking the loop lets slower servers finish starting meanwhile
+        user_input = (await ainput("\nYou: ")).strip()
         if user_input.lower() in {"exit", "quit", "q"}:
                 break 
         # -- command handling logic ----
         if user_input.lower() == "/prompts":
-            await list_prompts(client, server_configs)
+            await list_prompts(pool, server_configs)
             continue # command is done loop back for next input 
 
         elif user_input.startswith("/prompt"):
             # the function returns the prompt text or none 
-            prompt_text = await handle_prompt(client, user_input)
+            prompt_text = await handle_prompt(pool, user_input)
             if prompt_text:
                 message_to_agent = prompt_text 
             else: 
@@ -273,14 +489,14 @@ async def main():
                 continue 
 
         elif user_input.lower() == "/resources":
-            await list_resources(client, server_configs)
+            await list_resources(pool, server_configs)
             continue
 
         elif user_input.startswith("/resource"):
-            resource_content = await handle_resource(client,user_input)
+            resource_content = await handle_resource(pool,user_input)
             
             if resource_content:
-                action_prompt = input("Resource loaded. What should I do with this content?(Press enter to just save to content)\n").strip() 
+                action_prompt = (await ainput("Resource loaded. What should I do with this content?(Press enter to just save to content)\n")).strip()
 
                 # if user provides an action, combine it with the resource content
                 if action_prompt:
@@ -312,6 +528,9 @@ async def main():
         # --final agent invocation
 
         if message_to_agent:
+            if catalog.version != agent_version:
+                agent_version = catalog.version
+                agent = create_graph(catalog.tools, checkpointer)
             try:
                 response = await agent.ainvoke(
                     {"messages": [("user", message_to_agent)]},
@@ -321,6 +540,12 @@ async def main():
             except Exception as e:
                 print("Error:", e)
 
+    await close_checkpointer(checkpointer)
+    await pool.close()
+
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    if "--benchmark" in sys.argv:
+        asyncio.run(benchmark_sessions(server_configs))
+    else:
+        asyncio.run(main())
\ No newline at end of file
@@ -1,5 +1,6 @@
 import os 
 from mcp.server.fastmcp import FastMCP 
+from mcp_http_transport import run_server
 from typing import List 
 from pathlib import Path 
 
@@ -105,6 +106,6 @@ def meeting_notes_resource() -> list[str]:
 
 
 if __name__ == "__main__":
-    print("Starting MCP Task Server...")
-    # the server will run and listen for requests from the client over stdio
-    mcp.run(transport="stdio")
\ No newline at end of file
+    # the server will run and listen for requests from the client over stdio,
+    # or over streamable HTTP with --transport streamable-http
+    run_server(mcp, default_port=8001)
\ No newline at end of file
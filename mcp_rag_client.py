@@ -4,16 +4,21 @@ from mcp.client.stdio import stdio_client
 
 from langgraph.graph import StateGraph, START, END 
 from langgraph.graph.message import AnyMessage, add_messages 
-from langgraph.checkpoint.memory import MemorySaver 
 from langgraph.prebuilt import tools_condition, ToolNode 
 from typing import Annotated, List
 from typing_extensions import TypedDict 
 
 from langchain_google_genai import ChatGoogleGenerativeAI 
-from langchain_core.prompts import ChatPromptTemplate, MesssagesPlaceholder 
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder 
 
 from langchain_mcp_adapters.tools import load_mcp_tools 
 
+# keeps the resent history within a token budget
+from conversation_history import HistoryManager
+
+# conversations survive restarts when CHECKPOINT_BACKEND=sqlite is set
+from checkpointing import create_checkpointer, close_checkpointer
+
 # MCP server launch config 
 server_params = StdioServerParameters(
     command="python",
@@ -23,8 +28,10 @@ server_params = StdioServerParameters(
 # LangGraph state definition 
 class State(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
+    # running summary of the turns dropped from messages
+    summary: str
 
-async def create_graph(session):
+async def create_graph(session, checkpointer):
     # load tools from mcp server 
     tools = await load_mcp_tools(session)
 
@@ -37,30 +44,35 @@ async def create_graph(session):
         ("system", "You are a helpful RAG assistant. Your role is to answer questions using the content of the documents provided by the user. \
           When a user gives you a file path, use your tool to ingest it into your memory. When they ask a question, use your search tool to find \
           the relevant context within the ingested documents and use that context to form a clear answer"),
-        MesssagesPlaceholder("messages") 
+        MessagesPlaceholder("messages") 
     ])
 
     chat_llm = prompt_template | llm_with_tools
 
+    # retrieved chunks from earlier turns are elided and old turns summarized
+    history = HistoryManager(llm)
+
     # define chat node 
     def chat_node(state: State) -> State: 
-        state["messages"] = chat_llm.invoke({
-            "messages": state["messages"]
+        response = chat_llm.invoke({
+            "messages": history.context(state)
         })
-        return state 
+        return {"messages": [response]}
     
     # build langgraph with tool routing 
     graph = StateGraph(State)
+    graph.add_node("history_node", history.node)
     graph.add_node("chat_node", chat_node)
     graph.add_node("tool_node", ToolNode(tools=tools))
-    graph.add_edge(START, "chat_node")
+    graph.add_edge(START, "history_node")
+    graph.add_edge("history_node", "chat_node")
     graph.add_conditional_edges("chat_node", tools_condition, {
-        "tools": "tools_node",
+        "tools": "tool_node",
         "__end__": END
     })
     graph.add_edge("tool_node","chat_node")
 
-    return graph.compile(checkpointer=MemorySaver())
+    return graph.compile(checkpointer=checkpointer)
 
 # entry point 
 async def main():
@@ -68,7 +80,8 @@ async def main():
         async with ClientSession(read, write) as session: 
             await session.initialize() 
 
-            agent = await create_graph(session)
+            checkpointer = await create_checkpointer()
+            agent = await create_graph(session, checkpointer)
 
             # print statement for clarity 
             print(
@@ -96,5 +109,7 @@ async def main():
                 except Exception as e: 
                     print("Error:", e)
 
+            await close_checkpointer(checkpointer)
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
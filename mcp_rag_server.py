@@ -1,6 +1,7 @@
 import os 
 import logging 
 from mcp.server.fastmcp import FastMCP 
+from mcp_http_transport import run_server
 from typing import List 
 
 # Langchain imports for RAG pipeline 
@@ -139,5 +140,6 @@ def query_rag_store(query: str) -> str:
 if __name__ == "__main__":
     logging.getLogger("mcp").setLevel(logging.WARNING)
 
-    # the server will run and listen for requests from the client over stdio 
-    mcp.run(transport="stdio")
\ No newline at end of file
+    # the server will run and listen for requests from the client over stdio,
+    # or over streamable HTTP with --transport streamable-http
+    run_server(mcp, default_port=8003)
\ No newline at end of file
@@ -0,0 +1,379 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple, Union
+
+from mcp import ClientSession
+from langchain_mcp_adapters.sessions import create_session
+from langchain_mcp_adapters.tools import load_mcp_tools
+
+
+def normalize_server_config(config: Union[dict, str]) -> dict:
+    """
+    Accepts either a full connection dictionary or just the URL of a shared,
+    long-lived streamable-HTTP server (e.g. "http://127.0.0.1:8001/mcp").
+
+    Returns:
+        A connection dictionary understood by langchain_mcp_adapters
+    """
+    if isinstance(config, str):
+        return {"transport": "streamable_http", "url": config}
+    if "url" in config and "transport" not in config:
+        return {**config, "transport": "streamable_http"}
+    return config
+
+
+async def ainput(prompt: str = "") -> str:
+    """
+    input() that keeps the event loop running while it waits for the user, so servers
+    started with start(wait_for_all=False) keep coming online between turns.
+
+    The line is read on a daemon thread rather than with asyncio.to_thread: asyncio.run
+    waits for its executor threads at exit, so Ctrl-C would not quit until enter is pressed.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def deliver(setter, value):
+        if not future.done():
+            setter(value)
+
+    def read():
+        try:
+            line = input(prompt)
+        except BaseException as e:
+            loop.call_soon_threadsafe(deliver, future.set_exception, e)
+        else:
+            loop.call_soon_threadsafe(deliver, future.set_result, line)
+
+    threading.Thread(target=read, daemon=True).start()
+    return await future
+
+
+class _ServerConnection:
+    """
+    Owns the long-lived, initialized session for a single configured server.
+
+    The session is opened and closed inside one dedicated task, because the stdio
+    transport uses task groups that must be exited by the same task that entered them.
+    """
+    def __init__(self, name: str, config: Union[dict, str]):
+        self.name = name
+        self.config = normalize_server_config(config)
+        self.session: Optional[ClientSession] = None
+        self.task: Optional[asyncio.Task] = None
+        self.error: Optional[BaseException] = None
+        self.startup_time: Optional[float] = None
+        self.last_checked = 0.0
+        self.lock = asyncio.Lock()
+        self._ready = asyncio.Event()
+        self._stop = asyncio.Event()
+
+    async def _run(self):
+        try:
+            async with create_session(self.config) as session:
+                await session.initialize()
+                self.session = session
+                self.last_checked = time.monotonic()
+                self._ready.set()
+                # keep the server process and session alive until we are asked to stop
+                await self._stop.wait()
+        except Exception as e:
+            self.error = e
+        finally:
+            self.session = None
+            # wake up anyone waiting on readiness, even if the connection failed
+            self._ready.set()
+
+    async def open(self, timeout: float):
+        self.error = None
+        self._ready.clear()
+        self._stop.clear()
+        self.task = asyncio.create_task(self._run(), name=f"mcp-session-{self.name}")
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            await self.close(timeout)
+            raise ConnectionError(f"Timed out starting server '{self.name}' after {timeout:.0f}s")
+
+        if self.session is None:
+            raise ConnectionError(f"Could not start server '{self.name}': {self.error}")
+
+    async def wait_ready(self):
+        await self._ready.wait()
+
+    async def close(self, timeout: float):
+        if self.task is None:
+            return
+        self._stop.set()
+        try:
+            await asyncio.wait_for(self.task, timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError):
+            pass
+        except Exception:
+            pass
+        self.task = None
+        self.session = None
+
+
+class _PooledSession:
+    """
+    Stand-in for a ClientSession that always forwards to the pool's current live
+    session for a server, so tools, prompts and resources survive reconnects.
+    """
+    def __init__(self, pool: "MCPSessionPool", server_name: str):
+        self._pool = pool
+        self._server_name = server_name
+
+    @property
+    def server_name(self) -> str:
+        return self._server_name
+
+    def __getattr__(self, attr: str):
+        async def forward(*args, **kwargs):
+            session = await self._pool.get_session(self._server_name)
+            try:
+                return await getattr(session, attr)(*args, **kwargs)
+            except Exception:
+                # force a health check on the next checkout, the server may have died
+                self._pool.mark_stale(self._server_name)
+                raise
+        return forward
+
+
+class MCPSessionPool:
+    """
+    Keeps one long-lived, initialized MCP session per configured server and
+    hands it out for tool calls, prompts and resources.
+
+    Sessions are health checked with a ping when they have been idle for longer
+    than `health_check_interval` seconds and are transparently reconnected if the
+    server process has died.
+
+    A server config can also be a plain URL, in which case the pool connects to an
+    already running streamable-HTTP server instead of spawning a private copy.
+    """
+    def __init__(self, server_configs: Dict[str, Union[dict, str]], health_check_interval: float = 30.0,
+                 startup_timeout: float = 60.0, ping_timeout: float = 5.0):
+        self.server_configs = server_configs
+        self.health_check_interval = health_check_interval
+        self.startup_timeout = startup_timeout
+        self.ping_timeout = ping_timeout
+        self._connections: Dict[str, _ServerConnection] = {
+            name: _ServerConnection(name, config) for name, config in server_configs.items()
+        }
+        self._startup_tasks: Dict[str, asyncio.Task] = {}
+        self._ready_callbacks: List[Callable[[str], Awaitable[None]]] = []
+
+    def _get_connection(self, server_name: str) -> _ServerConnection:
+        if server_name not in self._connections:
+            raise ValueError(
+                f"Couldn't find a server with name '{server_name}', "
+                f"expected one of '{list(self._connections.keys())}'"
+            )
+        return self._connections[server_name]
+
+    def add_ready_callback(self, callback: Callable[[str], Awaitable[None]]):
+        """Registers an async callback that is called with the server name once that server is ready"""
+        self._ready_callbacks.append(callback)
+
+    async def _start_server(self, conn: _ServerConnection):
+        start = time.perf_counter()
+        try:
+            await conn.open(self.startup_timeout)
+        except ConnectionError as e:
+            print(f"\nWarning: {e}")
+            return
+        finally:
+            conn.startup_time = time.perf_counter() - start
+
+        print(f"\n---Server '{conn.name}' ready in {conn.startup_time:.2f}s----")
+        for callback in self._ready_callbacks:
+            try:
+                await callback(conn.name)
+            except Exception as e:
+                print(f"\nWarning: ready callback failed for server '{conn.name}': {e}")
+
+    async def start(self, wait_for_all: bool = True):
+        """
+        Launches every configured server concurrently and initializes its session,
+        so cold start costs the slowest server rather than the sum of all of them.
+        Servers that fail to start are reported and retried on first use.
+
+        Args:
+            wait_for_all: If False, return immediately and let the servers come online
+                          in the background (see wait_for_any)
+        """
+        for name, conn in self._connections.items():
+            if name not in self._startup_tasks:
+                self._startup_tasks[name] = asyncio.create_task(
+                    self._start_server(conn), name=f"mcp-startup-{name}"
+                )
+        if wait_for_all:
+            await asyncio.gather(*self._startup_tasks.values())
+
+    async def wait_for_any(self, timeout: Optional[float] = None) -> List[str]:
+        """
+        Waits until at least one server is ready (or every server has finished starting).
+
+        Returns:
+            The names of the servers that are ready so far
+        """
+        pending = {task for task in self._startup_tasks.values() if not task.done()}
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while pending and not self.ready_servers():
+            remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+            done, pending = await asyncio.wait(
+                pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED
+            )
+            if not done:
+                break
+        return self.ready_servers()
+
+    def ready_servers(self) -> List[str]:
+        return [name for name, conn in self._connections.items() if conn.session is not None]
+
+    def startup_report(self) -> Dict[str, dict]:
+        """
+        Returns the readiness state and startup time (in seconds) of each server
+        """
+        report = {}
+        for name, conn in self._connections.items():
+            task = self._startup_tasks.get(name)
+            if conn.session is not None:
+                state = "ready"
+            elif task is not None and not task.done():
+                state = "starting"
+            else:
+                state = "failed"
+            report[name] = {"state": state, "startup_time": conn.startup_time}
+        return report
+
+    async def _is_healthy(self, conn: _ServerConnection) -> bool:
+        if conn.session is None or conn.task is None or conn.task.done():
+            return False
+        try:
+            await asyncio.wait_for(conn.session.send_ping(), self.ping_timeout)
+        except Exception:
+            return False
+        conn.last_checked = time.monotonic()
+        return True
+
+    async def get_session(self, server_name: str) -> ClientSession:
+        """
+        Returns the live session for a server, reconnecting first if the
+        health check fails.
+
+        Args:
+            server_name: Name of the server as it appears in server_configs
+
+        Returns:
+            An initialized ClientSession
+        """
+        conn = self._get_connection(server_name)
+
+        # a server that is still starting up is waited for rather than restarted
+        startup = self._startup_tasks.get(server_name)
+        if startup is not None and not startup.done() and conn.session is None:
+            await conn.wait_ready()
+
+        async with conn.lock:
+            stale = time.monotonic() - conn.last_checked > self.health_check_interval
+            if conn.session is None or stale:
+                if not await self._is_healthy(conn):
+                    print(f"\n---Reconnecting to server '{server_name}'...----")
+                    await conn.close(self.ping_timeout)
+                    await conn.open(self.startup_timeout)
+            return conn.session
+
+    def session(self, server_name: str) -> _PooledSession:
+        """
+        Returns a session handle that can be passed anywhere a ClientSession is
+        expected (load_mcp_tools, load_mcp_prompt, load_mcp_resources, ...).
+        """
+        self._get_connection(server_name)
+        return _PooledSession(self, server_name)
+
+    async def fan_out(self, operation: Callable[[_PooledSession], Awaitable[Any]], timeout: float = 10.0,
+                      server_names: Optional[Iterable[str]] = None) -> Tuple[Dict[str, Any], Dict[str, Exception]]:
+        """
+        Runs the same operation against every server concurrently, so querying N servers
+        costs the latency of the slowest one rather than the sum.
+
+        Args:
+            operation: Async callable receiving a server's session, e.g. lambda s: s.list_prompts()
+            timeout: Seconds each server is given before it is reported as failed
+            server_names: Servers to query. Defaults to every configured server
+
+        Returns:
+            A (results, errors) tuple of dictionaries keyed by server name. A slow or dead
+            server only appears in errors, the rest of the results are still returned.
+        """
+        names = list(server_names if server_names is not None else self._connections.keys())
+
+        async def run(server_name: str):
+            try:
+                return await asyncio.wait_for(operation(self.session(server_name)), timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"no response within {timeout:.0f}s")
+
+        outcomes = await asyncio.gather(*(run(name) for name in names), return_exceptions=True)
+
+        results, errors = {}, {}
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, BaseException):
+                errors[name] = outcome
+            else:
+                results[name] = outcome
+        return results, errors
+
+    def mark_stale(self, server_name: str):
+        self._get_connection(server_name).last_checked = 0.0
+
+    async def close(self):
+        """Shuts down every server session owned by the pool"""
+        for task in self._startup_tasks.values():
+            task.cancel()
+        await asyncio.gather(*self._startup_tasks.values(), return_exceptions=True)
+        await asyncio.gather(
+            *(conn.close(self.ping_timeout) for conn in self._connections.values())
+        )
+
+
+class ServerToolCatalog:
+    """
+    Collects the LangChain tools of each server as it comes online, so an agent can
+    start serving with the tools already available while slower servers catch up.
+    Tools are bound to the pool's persistent sessions.
+    """
+    def __init__(self, pool: MCPSessionPool):
+        self.pool = pool
+        self.version = 0
+        self._tools_by_server: Dict[str, list] = {}
+        pool.add_ready_callback(self.load)
+
+    async def load(self, server_name: str):
+        """Loads (or reloads) the tools of a single server"""
+        self._tools_by_server[server_name] = await load_mcp_tools(
+            self.pool.session(server_name), server_name=server_name
+        )
+        self.version += 1
+
+    async def refresh(self, timeout: float = 30.0):
+        """Reloads the tools of every server concurrently, keeping whatever came back in time"""
+        tools_by_server, errors = await self.pool.fan_out(
+            lambda session: load_mcp_tools(session, server_name=session.server_name), timeout=timeout
+        )
+        for server_name, e in errors.items():
+            print(f"\nCould not load tools from server '{server_name}': {e}")
+        self._tools_by_server.update(tools_by_server)
+        self.version += 1
+
+    @property
+    def tools(self) -> list:
+        # keep the order of server_configs so tool lists are stable between rebuilds
+        return [
+            tool
+            for server_name in self.pool.server_configs.keys()
+            for tool in self._tools_by_server.get(server_name, [])
+        ]
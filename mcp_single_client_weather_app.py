@@ -4,7 +4,6 @@ from mcp.client.stdio import stdio_client
 
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import AnyMessage, add_messages
-from langgraph.checkpoint.memory import MemorySaver
 from langgraph.prebuilt import tools_condition, ToolNode 
 from typing import Annotated, List 
 from typing_extensions import TypedDict 
@@ -15,6 +14,12 @@ from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_mcp_adapters.tools import load_mcp_tools 
 import shlex
 
+# keeps the resent history within a token budget
+from conversation_history import HistoryManager
+
+# conversations survive restarts when CHECKPOINT_BACKEND=sqlite is set
+from checkpointing import create_checkpointer, close_checkpointer
+
 # MCP server launch config 
 server_params = StdioServerParameters(
     command="python",
@@ -170,8 +175,10 @@ async def handle_resource(session, command: str) -> str | None:
 # langgraph state definition
 class State(TypedDict):
     messages: Annotated[List[AnyMessage], add_messages]
+    # running summary of the turns dropped from messages
+    summary: str
 
-async def create_graph(session):
+async def create_graph(session, checkpointer):
     # load tools from MCP server
     tools = await load_mcp_tools(session)
 
@@ -186,29 +193,36 @@ async def create_graph(session):
 
     # prompt template with user/assistant chat only
     prompt_template = ChatPromptTemplate.from_messages([
-        ("system", "you're a helpful assistant that uses tools to get the current weather for a location")
+        ("system", "you're a helpful assistant that uses tools to get the current weather for a location"),
+        MessagesPlaceholder("messages")
     ])
 
     chat_llm = prompt_template | llm_with_tools
 
+    # loaded resources and old turns are summarized instead of being resent every turn
+    history = HistoryManager(llm)
+
     # define chat node
     def chat_node(state: State) -> State: 
-        state["messages"] = chat_llm.invoke({
-            "messages": state["messages"]
+        response = chat_llm.invoke({
+            "messages": history.context(state)
         })
+        return {"messages": [response]}
 
     # build langgraph with tool routing
     graph = StateGraph(State)
+    graph.add_node("history_node", history.node)
     graph.add_node("chat_node", chat_node)
     graph.add_node("tool_node", ToolNode(tools=tools))
-    graph.add_edge(START, "chat_node")
+    graph.add_edge(START, "history_node")
+    graph.add_edge("history_node", "chat_node")
     graph.add_conditional_edges("chat_node", tools_condition, {
         "tools": "tool_node",
         "__end__": END 
     })
     graph.add_edge("tool_node", "chat_node")
     
-    return graph.compile("tool_node", "chat_node")
+    return graph.compile(checkpointer=checkpointer)
 
 # entry point
 async def main():
@@ -216,7 +230,8 @@ async def main():
         async with ClientSession(read,write) as session:
             await session.initialize()
 
-            agent = await create_graph(session)
+            checkpointer = await create_checkpointer()
+            agent = await create_graph(session, checkpointer)
 
             print("Weather MCP agent is ready")
 
@@ -308,5 +323,7 @@ async def main():
                     except Exception as e:
                         print("Error:", e)
 
+            await close_checkpointer(checkpointer)
+
 if __name__ == "__main__":
     asyncio.run(main())
\ No newline at end of file
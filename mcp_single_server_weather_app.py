@@ -1,6 +1,7 @@
 import os 
 import requests 
 from mcp.server.fastmcp import FastMCP
+from mcp_http_transport import run_server
 from pathlib import  Path
 
 OPENWEATHER_API_KEY="YOUR OPENWEATHER API KEY HERE"
@@ -124,5 +125,6 @@ def delivery_log_resource() -> list[str]:
         return [f"An unexpected error occured while reading the delivery log: {str(e)}"]
     
 if __name__ == "__main__":
-    # the server will run and listen for requests from the client over stdio
-    mcp.run(transport="stdio")
\ No newline at end of file
+    # the server will run and listen for requests from the client over stdio,
+    # or over streamable HTTP with --transport streamable-http
+    run_server(mcp, default_port=8002)
\ No newline at end of file
@@ -0,0 +1,108 @@
+import argparse
+import asyncio
+import json
+import random
+import re
+import time
+import uuid
+
+import uvicorn
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse
+from starlette.routing import Route
+
+SUPPORT_KEYWORDS = re.compile(
+    r"\b(order|refund|deliver\w*|arriv\w*|account|password|login|charged?|payment|invoice|broken|"
+    r"help|issue|problem|cancel\w*|return|warranty|support)\b",
+    re.IGNORECASE,
+)
+INJECTION_PATTERNS = re.compile(
+    r"ignore (all |any )?(previous|prior|above) instructions|system (prompt|configuration)|"
+    r"you are now|jailbreak|developer mode",
+    re.IGNORECASE,
+)
+
+
+def mock_parsed_response(schema_name: str, user_input: str) -> dict:
+    """Plausible structured output for the validation schemas of pattern_parallelization"""
+    if schema_name == "SupportRequestValidation":
+        is_support = bool(SUPPORT_KEYWORDS.search(user_input))
+        return {"is_support_request": is_support, "confidence_score": 0.92 if is_support else 0.15}
+    if schema_name == "SecurityCheck":
+        flags = [match.group(0) for match in INJECTION_PATTERNS.finditer(user_input)]
+        return {"is_safe": not flags, "risk_flags": flags}
+    raise ValueError(f"The mock endpoint does not know the response format '{schema_name}'")
+
+
+def create_app(latency: float = 0.3, jitter: float = 0.1) -> Starlette:
+    """
+    A local stand-in for the OpenAI chat completions API, for load testing without
+    spending tokens or hitting rate limits.
+
+    Every request waits `latency` seconds (+- normally distributed `jitter`) and returns
+    a structured output matching the requested json schema.
+
+    Args:
+        latency: Mean response time in seconds
+        jitter: Standard deviation of the response time in seconds
+    """
+    async def chat_completions(request: Request) -> JSONResponse:
+        body = await request.json()
+        schema_name = body.get("response_format", {}).get("json_schema", {}).get("name", "")
+        user_input = next((m["content"] for m in reversed(body["messages"]) if m["role"] == "user"), "")
+        try:
+            parsed = mock_parsed_response(schema_name, user_input)
+        except ValueError as e:
+            return JSONResponse({"error": {"message": str(e), "type": "invalid_request_error"}}, status_code=400)
+
+        await asyncio.sleep(max(0.0, random.gauss(latency, jitter)))
+
+        prompt_tokens = sum(len(str(m["content"])) for m in body["messages"]) // 4
+        content = json.dumps(parsed)
+        return JSONResponse({
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content, "refusal": None},
+                "logprobs": None,
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": len(content) // 4,
+                "total_tokens": prompt_tokens + len(content) // 4,
+            },
+        })
+
+    return Starlette(routes=[Route("/v1/chat/completions", chat_completions, methods=["POST"])])
+
+
+async def serve_in_background(port: int = 8008, latency: float = 0.3, jitter: float = 0.1) -> uvicorn.Server:
+    """
+    Starts the mock endpoint inside the running event loop.
+
+    Returns:
+        The server, set `server.should_exit = True` to stop it. The API base url is
+        http://127.0.0.1:<port>/v1
+    """
+    server = uvicorn.Server(uvicorn.Config(create_app(latency, jitter), host="127.0.0.1", port=port,
+                                           log_level="warning"))
+    asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.01)
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a mock OpenAI chat completions endpoint")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--latency", type=float, default=0.3, help="Mean response time in seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Standard deviation of the response time")
+    args = parser.parse_args()
+
+    print(f"Mock LLM endpoint at http://127.0.0.1:{args.port}/v1")
+    uvicorn.run(create_app(args.latency, args.jitter), host="127.0.0.1", port=args.port, log_level="warning")
@@ -1,11 +1,26 @@
-from pydantic import Field, BaseModel, List
-from typing import Dict
-from openai import OpenAI
+from pydantic import Field, BaseModel
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+from openai import OpenAI, AsyncOpenAI
+from collections import Counter, defaultdict
+import argparse
+import asyncio
+import difflib
+import hashlib
+import json
 import logging
+import os
+import re
+import sqlite3
+import threading
+import time
 
 client = OpenAI(
     api_key=("{{OPENAPI_API_KEY}}")
 )
+# the batch API shares one async client, and its connection pool, across all items
+async_client = AsyncOpenAI(
+    api_key=("{{OPENAPI_API_KEY}}")
+)
 model = "gpt-4.1"
 
 logging.basicConfig(
@@ -42,77 +57,287 @@ class OptimizedTranslation(BaseModel):
     changes_made: List[str] = Field(description="Specific improvements implemented")
     reasoning: str = Field(description="Explanation of how feedback was addressed")
 
-def generate_initial_translation(source_text: str, target_language: str, source_language:str="English") -> TranslationResponse:
+class CandidateEvaluation(BaseModel):
+    """Evaluation of one candidate translation in a comparative ranking"""
+    candidate_id: int = Field(description="Number of the candidate, as given in the request")
+    overall_score: float = Field(description="Overall quality score (1-10 scale)", ge=1, le=10)
+    specific_feedback: List[str] = Field(description="Specific areas for improvement")
+
+class CandidateRanking(BaseModel):
+    """Comparative evaluation of several candidate translations"""
+    ranking: List[CandidateEvaluation] = Field(description="Every candidate, ranked from best to worst")
+    reasoning: str = Field(description="Why the best candidate beats the others")
+
+class SegmentTranslation(BaseModel):
+    """Translation of one numbered segment of a document"""
+    segment_id: int = Field(description="Number of the segment, as given in the request")
+    translated_text: str = Field(description="The translated (or improved) segment")
+
+class SegmentTranslations(BaseModel):
+    """Translations of the requested segments"""
+    segments: List[SegmentTranslation] = Field(description="One entry per requested segment")
+
+class SegmentEvaluation(BaseModel):
+    """Evaluation of one translated segment"""
+    segment_id: int = Field(description="Number of the segment, as given in the request")
+    overall_score: float = Field(description="Overall quality score (1-10 scale)", ge=1, le=10)
+    specific_feedback: List[str] = Field(description="Specific areas for improvement")
+
+class SegmentEvaluations(BaseModel):
+    """Evaluations of the requested segments"""
+    segments: List[SegmentEvaluation] = Field(description="One entry per requested segment")
+
+def translation_messages(source_text: str, target_language: str, source_language: str,
+                         reference: Optional[Tuple[str, str]] = None) -> List[Dict]:
+    user_content = f"Please translate the following {source_language} text to {target_language}:\n\n{source_text}"
+    if reference is not None:
+        # a near-identical string translated and accepted earlier keeps terminology consistent
+        reference_source, reference_translation = reference
+        user_content += (
+            f"\n\nA very similar text was translated before. Reuse its wording where the texts match:"
+            f"\nOriginal: {reference_source}\nTranslation: {reference_translation}"
+        )
+    return [
+        {
+            "role": "system",
+            "content": f"""
+            You are an expert translator specializing in {source_language} to {target_language} translation.
+            Your goal is to create accurate, fluent translations that preserve the original meaning, style, and cultural context.
+            Pay attention to:
+            - Accuracy of meaning
+            - Natural flow in the target language
+            - Cultural appropriateness
+            - Preservation of original tone and style
+
+            Provide your translation along with brief reasoning for your choices.
+            """
+        },
+        {
+            "role": "user",
+            "content": user_content
+        }
+    ]
+
+
+def evaluation_messages(source_text: str, translated_text: str, target_language: str, source_language: str) -> List[Dict]:
+    return [
+        {
+            "role": "system",
+            "content": f"""
+            You are a critical translation evaluator with expertise in both {source_language} and {target_language}
+            Evaluate translations based on:
+            1. Accuracy: How well does it convey the original meaning?
+            2. Fluency: How natural does it sound in {target_language}
+            3. Cultural appropriateness: Are cultural nuances properly handled?
+            4. Style preservation: Is the original tone/style maintained?
+
+            Be thorough and constructive in your feedback. A translation is satisfactory only if scores 7+ overall.
+            Provide specific, actionable feedback for improvements.
+            """
+        },
+        {
+            "role": "user",
+            "content":f"""
+            Please evaluate this translation:
+
+            Original ({source_language}) : {source_text}
+
+            Translation ({target_language}): {translated_text}
+
+            Provide detailed scoring and specific feedback for improvement
+            """
+        }
+    ]
+
+
+def optimization_messages(source_text: str, current_translation: str, evaluation: TranslationEvaluation,
+                          target_language: str, source_language: str) -> List[Dict]:
+    feedback_summary = "\n".join([f"- {feedback}" for feedback in evaluation.specific_feedback])
+    return [
+        {
+            "role": "system",
+            "content": f"""
+            You are an expert translator tasked with improving a translation based on evaluation feedback.
+            Address the specific issues raised while maintaining the strengths of the current translation.
+            Focus on making targeted improvements rather completely rewriting
+            """
+        },
+        {
+            "role": "user",
+            "content": f"""
+            Please improve this translation
+
+            Original ({source_language}): {source_text}
+
+            Current Translation: ({target_language}) : {current_translation}
+
+            Evaluation Feedback: 
+            Overall score: {evaluation.overall_score}/10
+            Specific issues: {feedback_summary}
+
+            Please provide an improved version that addresses these specific concerns
+            """
+        }
+    ]
+
+
+# each best-of-n candidate is steered towards a different strength so the candidates actually differ
+CANDIDATE_FOCUS = [
+    "Stay as close to the original meaning as possible.",
+    "Favour natural, idiomatic phrasing in the target language.",
+    "Preserve the tone, rhythm and style of the original above all.",
+    "Adapt cultural references and idioms for a native reader.",
+]
+
+
+def candidate_messages(source_text: str, target_language: str, source_language: str, candidate_id: int,
+                       reference: Optional[Tuple[str, str]] = None) -> List[Dict]:
+    messages = translation_messages(source_text, target_language, source_language, reference)
+    messages[-1]["content"] += f"\n\n{CANDIDATE_FOCUS[candidate_id % len(CANDIDATE_FOCUS)]}"
+    return messages
+
+
+def comparative_evaluation_messages(source_text: str, candidates: List[str], target_language: str,
+                                    source_language: str) -> List[Dict]:
+    numbered = "\n\n".join(f"[{candidate_id}] {candidate}" for candidate_id, candidate in enumerate(candidates))
+    return [
+        evaluation_messages("", "", target_language, source_language)[0],
+        {
+            "role": "user",
+            "content": f"""
+            Please compare these candidate translations of the same text:
+
+            Original ({source_language}) : {source_text}
+
+            Candidates ({target_language}):
+
+            {numbered}
+
+            Score every candidate, rank them from best to worst and give specific feedback for each
+            """
+        }
+    ]
+
+
+def numbered_segments(segments: Dict[int, str]) -> str:
+    return "\n\n".join(f"[{segment_id}] {text}" for segment_id, text in segments.items())
+
+
+def segment_translation_messages(segments: Dict[int, str], target_language: str, source_language: str,
+                                 references: Optional[Dict[int, Tuple[str, str]]] = None) -> List[Dict]:
+    user_content = (
+        f"Please translate each numbered {source_language} segment of this document to {target_language}. "
+        f"Translate every segment on its own and keep its number:\n\n{numbered_segments(segments)}"
+    )
+    if references:
+        user_content += "\n\nSimilar segments were translated before. Reuse their wording where the texts match:\n"
+        user_content += "\n".join(f"[{segment_id}] Original: {source}\n    Translation: {translation}"
+                                   for segment_id, (source, translation) in references.items())
+    # same translator persona as the whole-text prompt
+    return [translation_messages("", target_language, source_language)[0], {"role": "user", "content": user_content}]
+
+
+def segment_evaluation_messages(sources: Dict[int, str], translations: Dict[int, str],
+                                target_language: str, source_language: str) -> List[Dict]:
+    pairs = "\n\n".join(
+        f"[{segment_id}] Original ({source_language}): {sources[segment_id]}\n"
+        f"    Translation ({target_language}): {translation}"
+        for segment_id, translation in translations.items()
+    )
+    return [
+        evaluation_messages("", "", target_language, source_language)[0],
+        {
+            "role": "user",
+            "content": f"""
+            Please evaluate the translation of each numbered segment separately:
+
+            {pairs}
+
+            Score every segment and give specific feedback for the ones that need improvement
+            """
+        }
+    ]
+
+
+def segment_optimization_messages(sources: Dict[int, str], translations: Dict[int, str],
+                                  evaluations: Dict[int, SegmentEvaluation],
+                                  target_language: str, source_language: str) -> List[Dict]:
+    segments = "\n\n".join(
+        f"[{segment_id}] Original ({source_language}): {sources[segment_id]}\n"
+        f"    Current Translation ({target_language}): {translation}\n"
+        f"    Overall score: {evaluations[segment_id].overall_score}/10\n"
+        f"    Specific issues: {'; '.join(evaluations[segment_id].specific_feedback)}"
+        for segment_id, translation in translations.items()
+    )
+    return [
+        {
+            "role": "system",
+            "content": f"""
+            You are an expert translator tasked with improving the translation of selected segments of a document
+            based on evaluation feedback. Address the specific issues raised for each segment while maintaining
+            the strengths of its current translation. Focus on making targeted improvements rather completely rewriting
+            """
+        },
+        {
+            "role": "user",
+            "content": f"""
+            Please improve the translation of each numbered segment
+
+            {segments}
+
+            Return an improved version of every segment that addresses its concerns, keeping its number
+            """
+        }
+    ]
+
+
+def record_usage(completion, usage: Optional[Dict[str, int]]):
+    """Adds the tokens used by a completion to a running total"""
+    if usage is not None and completion.usage is not None:
+        usage["total_tokens"] += completion.usage.total_tokens
+
+
+def parse(messages: List[Dict], response_format, usage: Optional[Dict[str, int]] = None):
+    """Structured-output call returning the parsed response"""
+    completion = client.beta.chat.completions.parse(
+        model=model,
+        messages=messages,
+        response_format=response_format
+    )
+    record_usage(completion, usage)
+    return completion.choices[0].message.parsed
+
+
+def generate_initial_translation(source_text: str, target_language: str, source_language:str="English",
+                                 reference: Optional[Tuple[str, str]] = None,
+                                 usage: Optional[Dict[str, int]] = None) -> TranslationResponse:
     """Generate initial translation of the source text"""
     logger.info(f"Generating initial translation from {source_language} to {target_language}")
 
     completion = client.beta.chat.completions.parse(
         model=model, 
-        messages=[
-            {
-                "role": "system",
-                "content": f"""
-                You are an expert translator specializing in {source_language} to {target_language} translation.
-                Your goal is to create accurate, fluent translations that preserve the original meaning, style, and cultural context.
-                Pay attention to:
-                - Accuracy of meaning
-                - Natural flow in the target language
-                - Cultural appropriateness
-                - Preservation of original tone and style
-
-                Provide your translation along with brief reasoning for your choices.
-                """
-            },
-            {
-                "role": "user",
-                "content": f"Please translate the following {source_language} text to {target_language}:\n\n{source_text}"
-            }
-        ],
+        messages=translation_messages(source_text, target_language, source_language, reference),
         response_format=TranslationResponse
     )
+    record_usage(completion, usage)
     result = completion.choices[0].message.parsed 
     logger.info("Initial translation generated successfully")
     return result 
 
 
-def evaluate_translation(source_text: str, translated_text: str, target_language: str, source_language: str="English") -> TranslationEvaluation:
+def evaluate_translation(source_text: str, translated_text: str, target_language: str, source_language: str="English",
+                         usage: Optional[Dict[str, int]] = None) -> TranslationEvaluation:
     """Evaluate the quality of the translation"""
     logger.info("Evaluating translation quality")
 
     completion = client.beta.chat.completions.parse(
         model=model, 
-        messages=[
-            {
-                "role": "system",
-                "content": f"""
-                You are a critical translation evaluator with expertise in both {source_language} and {target_language}
-                Evaluate translations based on:
-                1. Accuracy: How well does it convey the original meaning?
-                2. Fluency: How natural does it sound in {target_language}
-                3. Cultural appropriateness: Are cultural nuances properly handled?
-                4. Style preservation: Is the original tone/style maintained?
-
-                Be thorough and constructive in your feedback. A translation is satisfactory only if scores 7+ overall.
-                Provide specific, actionable feedback for improvements.
-                """
-            },
-            {
-                "role": "user",
-                "content":f"""
-                Please evaluate this translation:
-
-                Original ({source_language}) : {source_text}
-
-                Translation ({target_language}): {translated_text}
-
-                Provide detailed scoring and specific feedback for improvement
-                """
-            }
-        ],
+        messages=evaluation_messages(source_text, translated_text, target_language, source_language),
         response_format=TranslationEvaluation
     )
+    record_usage(completion, usage)
     result = completion.choices[0].message.parsed 
-    logger.info(f"Translation evaluated - Overall score: {result.overall_socre:.1f}, Satisfactory: {result.is_satisfactory}")
+    logger.info(f"Translation evaluated - Overall score: {result.overall_score:.1f}, Satisfactory: {result.is_satisfactory}")
 
     if not result.is_satisfactory:
         logger.info(f"Key feedback ares {','.join(result.specific_feedback[:3])}")
@@ -120,48 +345,168 @@ def evaluate_translation(source_text: str, translated_text: str, target_language
 
 
 def optimize_translation(source_text: str, current_translation: str, evaluation: TranslationEvaluation,
-                         target_language: str, source_language: str="English") -> OptimizedTranslation:
+                         target_language: str, source_language: str="English",
+                         usage: Optional[Dict[str, int]] = None) -> OptimizedTranslation:
     """Improve the translation based on evaluation feedback"""
     logger.info("Optimizing translation based on feedback")
 
-    feedback_summary = "\n".join([f"- {feedback}" for feedback in evaluation.specific_feedback])
-
     completion = client.beta.chat.completions.parse(
         model=model, 
-        messages=[
-            {
-                "role": "system",
-                "content": f"""
-                You are an expert translator tasked with improving a translation based on evaluation feedback.
-                Address the specific issues raised while maintaining the strengths of the current translation.
-                Focus on making targeted improvements rather completely rewriting
-                """
-            },
-            {
-                "role": "user",
-                "content": f"""
-                Please improve this translation
-
-                Original ({source_language}): {source_text}
-
-                Current Translation: ({target_language}) : {current_translation}
-
-                Evaluation Feedback: 
-                Overall score: {evaluation.overall_score}/10
-                Specific issues: {feedback_summary}
-
-                Please provide an improved version that addresses these specific concerns
-                """
-            }
-        ],
+        messages=optimization_messages(source_text, current_translation, evaluation, target_language, source_language),
         response_format=OptimizedTranslation
     )
+    record_usage(completion, usage)
     result = completion.choices[0].message.parsed
     logger.info("Translation optimization completed")
     return result
 
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def trigrams(text: str) -> set:
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class TranslationMemory:
+    """
+    Persistent store of accepted translations keyed by (source text, source language,
+    target language), with fuzzy lookup of near-identical source strings.
+
+    Exact matches (after whitespace normalization) that meet the caller's quality threshold
+    are returned without any LLM call.
+    For near-matches, candidates sharing the most character trigrams are re-scored with
+    difflib's edit-based similarity, and the closest one at or above `fuzzy_threshold`
+    is given to the generator as a reference translation.
+
+    Args:
+        path: SQLite file holding the memory
+        fuzzy_threshold: Minimum similarity (0-1) for a near-match
+        max_candidates: Number of trigram candidates re-scored per lookup
+    """
+    def __init__(self, path: str = "translation_memory.sqlite", fuzzy_threshold: float = 0.8,
+                 max_candidates: int = 20):
+        self.fuzzy_threshold = fuzzy_threshold
+        self.max_candidates = max_candidates
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS translations (
+                source_language TEXT NOT NULL,
+                target_language TEXT NOT NULL,
+                source_text TEXT NOT NULL,
+                translation TEXT NOT NULL,
+                score REAL NOT NULL,
+                tokens INTEGER NOT NULL,
+                PRIMARY KEY (source_language, target_language, source_text)
+            )
+        """)
+        self.conn.commit()
+
+        # in-memory trigram index per language pair: trigram -> source texts containing it
+        self.entries: Dict[Tuple[str, str], Dict[str, Tuple[str, float, int]]] = defaultdict(dict)
+        self.index: Dict[Tuple[str, str], Dict[str, set]] = defaultdict(lambda: defaultdict(set))
+        for row in self.conn.execute("SELECT * FROM translations"):
+            self._add_to_index(*row)
+
+        self.counts = Counter()
+
+    def _add_to_index(self, source_language, target_language, source_text, translation, score, tokens):
+        pair = (source_language, target_language)
+        self.entries[pair][source_text] = (translation, score, tokens)
+        for gram in trigrams(source_text):
+            self.index[pair][gram].add(source_text)
+
+    def lookup(self, source_text: str, target_language: str, source_language: str,
+               quality_threshold: float = 0.0) -> Tuple[str, Optional[Dict]]:
+        """
+        Returns ("exact", entry), ("fuzzy", entry) or ("miss", None). An entry holds
+        source_text, translation, score, tokens and, for fuzzy matches, similarity.
+
+        An exact match scored below `quality_threshold` is not reused as is, it is
+        returned as a fuzzy match so the generator can still start from it.
+        """
+        text = normalize_text(source_text)
+        pair = (source_language, target_language)
+        with self.lock:
+            self.counts["lookups"] += 1
+            if text in self.entries[pair]:
+                translation, score, tokens = self.entries[pair][text]
+                entry = {"source_text": text, "translation": translation, "score": score, "tokens": tokens}
+                if score >= quality_threshold:
+                    self.counts["exact_hits"] += 1
+                    self.counts["tokens_saved"] += tokens
+                    return "exact", entry
+                self.counts["fuzzy_hits"] += 1
+                return "fuzzy", {**entry, "similarity": 1.0}
+
+            # candidates sharing the most trigrams, then the closest by edit similarity
+            shared = Counter()
+            for gram in trigrams(text):
+                shared.update(self.index[pair].get(gram, ()))
+            best, best_similarity = None, 0.0
+            for candidate, _ in shared.most_common(self.max_candidates):
+                similarity = difflib.SequenceMatcher(None, text, candidate).ratio()
+                if similarity > best_similarity:
+                    best, best_similarity = candidate, similarity
+
+            if best is not None and best_similarity >= self.fuzzy_threshold:
+                translation, score, tokens = self.entries[pair][best]
+                self.counts["fuzzy_hits"] += 1
+                return "fuzzy", {"source_text": best, "translation": translation, "score": score,
+                                 "tokens": tokens, "similarity": best_similarity}
+
+            self.counts["misses"] += 1
+            return "miss", None
+
+    def add(self, source_text: str, target_language: str, source_language: str,
+            translation: str, score: float, tokens: int):
+        """Stores an accepted translation along with the tokens it took to produce"""
+        text = normalize_text(source_text)
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO translations VALUES (?, ?, ?, ?, ?, ?)",
+                (source_language, target_language, text, translation, score, tokens),
+            )
+            self.conn.commit()
+            self._add_to_index(source_language, target_language, text, translation, score, tokens)
+
+    def record_tokens(self, tokens: int):
+        """Counts the tokens spent on translations that were not exact hits"""
+        with self.lock:
+            self.counts["tokens_spent"] += tokens
+
+    def stats(self) -> Dict:
+        lookups = self.counts["lookups"]
+        hits = self.counts["exact_hits"] + self.counts["fuzzy_hits"]
+        return {
+            "lookups": lookups,
+            "exact_hits": self.counts["exact_hits"],
+            "fuzzy_hits": self.counts["fuzzy_hits"],
+            "misses": self.counts["misses"],
+            "exact_hit_rate": self.counts["exact_hits"] / lookups if lookups else 0.0,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "tokens_saved": self.counts["tokens_saved"],
+            "tokens_spent": self.counts["tokens_spent"],
+            "entries": sum(len(entries) for entries in self.entries.values()),
+        }
+
+
+def memory_result(entry: Dict) -> Dict:
+    """Result of a translation served straight from the translation memory"""
+    return {
+        "final_translation": entry["translation"],
+        "final_score": entry["score"],
+        "total_iterations": 0,
+        "iterations": [],
+        "total_tokens": 0,
+        "memory": "exact",
+    }
+
+
 def evaluator_optimizer_translation(source_text: str, target_language: str, source_language: str="English",
-    max_iterations: int=3, quality_threshold: float = 7) -> Dict: 
+    max_iterations: int=3, quality_threshold: float = 7, memory: Optional[TranslationMemory] = None) -> Dict: 
     
     """
     Main fuction implementing the evaluator-optimizer pattern for translation
@@ -172,16 +517,28 @@ def evaluator_optimizer_translation(source_text: str, target_language: str, sour
         source_language: Source language (default: English)
         max_iterations: Maximum number of optimization iterations 
         quality_threshold: Minimum score to consider translation satisfactory
+        memory: Translation memory consulted before and updated after translating
 
     Returns:
         Dictionary with final translation and process history
     """
+    if max_iterations < 1:
+        raise ValueError(f"max_iterations must be at least 1, got {max_iterations}")
     logger.info(f"Starting evaluator-optimizer translation process")
     logger.info(f"Source: {source_language} -> Target: {target_language}")
     logger.info(f"Max iterations: {max_iterations}, Quality threshold: {quality_threshold}")
 
+    # strings translated before are reused as is, near-identical ones guide the generator
+    match, entry = memory.lookup(source_text, target_language, source_language, quality_threshold) if memory else ("miss", None)
+    if match == "exact":
+        logger.info("Exact translation memory hit, skipping the LLM calls")
+        return memory_result(entry)
+    reference = (entry["source_text"], entry["translation"]) if match == "fuzzy" else None
+    usage = {"total_tokens": 0}
+
     # generate initial translation
-    current_translation = generate_initial_translation(source_text, target_language, source_language)
+    current_translation = generate_initial_translation(source_text, target_language, source_language,
+                                                       reference, usage)
 
     iterations = []
     iteration_count = 0 
@@ -192,7 +549,7 @@ def evaluator_optimizer_translation(source_text: str, target_language: str, sour
 
         # evaluate current translation
         evaluation = evaluate_translation(source_text, current_translation.translated_text,
-                                          target_language, source_language)
+                                          target_language, source_language, usage)
         
         iteration_data = {
             "iteration": iteration_count,
@@ -212,52 +569,688 @@ def evaluator_optimizer_translation(source_text: str, target_language: str, sour
         if iteration_count < max_iterations:
             logger.info(f"Score {evaluation.overall_score:.1f} below threshold, optimizing...")
             optimization = optimize_translation(source_text, current_translation.translated_text,
-                                                evaluation, target_language, source_language)
+                                                evaluation, target_language, source_language, usage)
             
+            iteration_data["optimization"] = optimization
+
             # update current translation for next iteration
             current_translation=TranslationResponse(
                 translated_text=optimization.improved_text,
                 reasoning=optimization.reasoning
             )
 
+        iterations.append(iteration_data)
+
+    result = {
+        "final_translation": iterations[-1]["translation"],
+        "final_score": iterations[-1]["evaluation"].overall_score,
+        "total_iterations": len(iterations),
+        "iterations": iterations,
+        "total_tokens": usage["total_tokens"],
+        "memory": None if match == "miss" else match,
+    }
+    remember(memory, source_text, target_language, source_language, result)
+    return result
+
+
+def remember(memory: Optional[TranslationMemory], source_text: str, target_language: str,
+             source_language: str, result: Dict):
+    """Stores the final translation in the memory if the evaluator accepted it"""
+    if memory is None:
+        return
+    memory.record_tokens(result["total_tokens"])
+    if result["iterations"][-1].get("final"):
+        memory.add(source_text, target_language, source_language,
+                   result["final_translation"], result["final_score"], result["total_tokens"])
+
+
+# paragraphs are separated by blank lines, sentences end in ., ! or ? followed by whitespace
+SEGMENT_BOUNDARIES = {
+    "paragraph": r"\n[ \t]*\n\s*",
+    "sentence": r"(?<=[.!?])\s+",
+}
+
+
+def split_segments(text: str, segment_by: str = "paragraph") -> Tuple[List[str], List]:
+    """
+    Splits a document into paragraphs or sentences.
+
+    Returns:
+        The segments, and a layout of the document: the whitespace between segments as
+        strings and each segment as its index, so translated segments can be reassembled
+        with `join_segments`
+    """
+    pieces = re.split(f"({SEGMENT_BOUNDARIES[segment_by]})", text)
+    segments, layout = [], []
+    for i, piece in enumerate(pieces):
+        core = piece.strip()
+        # odd pieces are the boundaries themselves
+        if i % 2 or not core:
+            layout.append(piece)
+            continue
+        start = piece.index(core)
+        layout += [piece[:start], len(segments), piece[start + len(core):]]
+        segments.append(core)
+    return segments, layout
+
+
+def join_segments(layout: List, translations: Dict[int, str]) -> str:
+    return "".join(translations[part] if isinstance(part, int) else part for part in layout)
+
+
+def by_segment_id(items: List, requested: Iterable[int]) -> Dict[int, BaseModel]:
+    """Indexes segment results by id, ignoring any segment that was not asked for"""
+    requested = set(requested)
+    return {item.segment_id: item for item in items if item.segment_id in requested}
+
+
+def segmented_evaluator_optimizer_translation(source_text: str, target_language: str, source_language: str="English",
+    max_iterations: int=3, quality_threshold: float = 7, segment_by: str = "paragraph",
+    memory: Optional[TranslationMemory] = None) -> Dict:
+    """
+    Evaluator-optimizer translation of a long document, one segment at a time
+
+    The document is split into paragraphs or sentences and translated in one call. Every
+    iteration then evaluates only the segments that have not passed yet, in one batched
+    call, and re-optimizes only those that scored below `quality_threshold`. Segments that
+    pass are frozen, so after the first iteration the cost of each iteration is
+    proportional to the failing segments rather than to the whole document.
+
+    Args:
+        source_text: Document to translate
+        target_language: Target language for translation
+        source_language: Source language (default: English)
+        max_iterations: Maximum number of evaluation iterations
+        quality_threshold: Minimum score for a segment to be accepted
+        segment_by: "paragraph" or "sentence"
+        memory: Translation memory consulted and updated per segment
+
+    Returns:
+        Dictionary with the reassembled translation, per-segment results and process history
+    """
+    if max_iterations < 1:
+        raise ValueError(f"max_iterations must be at least 1, got {max_iterations}")
+    segments, layout = split_segments(source_text, segment_by)
+    sources = dict(enumerate(segments))
+    logger.info(f"Starting segmented translation: {len(segments)} {segment_by} segments, "
+                f"{source_language} -> {target_language}")
+
+    translations: Dict[int, str] = {}
+    scores: Dict[int, float] = {}
+    references: Dict[int, Tuple[str, str]] = {}
+    memory_matches = Counter()
+
+    # segments translated before are reused as is, near-identical ones guide the generator
+    for segment_id, segment in sources.items():
+        match, entry = memory.lookup(segment, target_language, source_language, quality_threshold) if memory else ("miss", None)
+        memory_matches[match] += 1
+        if match == "exact":
+            translations[segment_id] = entry["translation"]
+            scores[segment_id] = entry["score"]
+        elif match == "fuzzy":
+            references[segment_id] = (entry["source_text"], entry["translation"])
+
+    pending = {segment_id: segment for segment_id, segment in sources.items() if segment_id not in translations}
+    usage = {"total_tokens": 0}
+
+    # generate the initial translation of all new segments in one call
+    if pending:
+        logger.info(f"Generating initial translation of {len(pending)} segments "
+                    f"({len(sources) - len(pending)} from translation memory)")
+        response = parse(segment_translation_messages(pending, target_language, source_language, references),
+                         SegmentTranslations, usage)
+        translated = by_segment_id(response.segments, pending)
+        for segment_id, segment in pending.items():
+            if segment_id in translated:
+                translations[segment_id] = translated[segment_id].translated_text
+            else:
+                # the model skipped a segment, translate it on its own
+                logger.warning(f"Segment {segment_id} missing from the batch translation, retrying it alone")
+                translations[segment_id] = generate_initial_translation(
+                    segment, target_language, source_language, references.get(segment_id), usage
+                ).translated_text
+    initial_tokens = usage["total_tokens"]
+
+    iterations = []
+    to_evaluate = sorted(pending)
+
+    for iteration_count in range(1, max_iterations + 1):
+        if not to_evaluate:
+            break
+        logger.info(f"---Iteration {iteration_count}: evaluating {len(to_evaluate)}/{len(sources)} segments ---")
+        tokens_before = usage["total_tokens"]
+
+        response = parse(segment_evaluation_messages({i: sources[i] for i in to_evaluate},
+                                                     {i: translations[i] for i in to_evaluate},
+                                                     target_language, source_language),
+                         SegmentEvaluations, usage)
+        evaluations = by_segment_id(response.segments, to_evaluate)
+        for segment_id, evaluation in evaluations.items():
+            scores[segment_id] = evaluation.overall_score
+
+        # a segment the evaluator skipped is evaluated again next iteration
+        failing = [i for i in to_evaluate if i not in evaluations or evaluations[i].overall_score < quality_threshold]
+        iteration_data = {
+            "iteration": iteration_count,
+            "evaluated": to_evaluate,
+            "failing": failing,
+            "evaluations": evaluations,
+            "optimization": None,
+        }
+
+        if not failing:
+            logger.info("All segments meet the quality threshold")
+            iteration_data["final"] = True
+            iteration_data["tokens"] = usage["total_tokens"] - tokens_before
+            iterations.append(iteration_data)
+            break
+
+        # if not final iteration, optimize only the failing segments
+        to_optimize = [i for i in failing if i in evaluations]
+        if iteration_count < max_iterations and to_optimize:
+            logger.info(f"{len(to_optimize)} segments below threshold, optimizing them...")
+            response = parse(segment_optimization_messages({i: sources[i] for i in to_optimize},
+                                                           {i: translations[i] for i in to_optimize},
+                                                           evaluations, target_language, source_language),
+                             SegmentTranslations, usage)
+            optimized = by_segment_id(response.segments, to_optimize)
+            for segment_id, segment in optimized.items():
+                translations[segment_id] = segment.translated_text
+            iteration_data["optimization"] = {i: segment.translated_text for i, segment in optimized.items()}
+
+        iteration_data["tokens"] = usage["total_tokens"] - tokens_before
+        logger.info(f"Iteration {iteration_count} used {iteration_data['tokens']} tokens")
+        iterations.append(iteration_data)
+        to_evaluate = failing
+
+    # the document score weights every segment by its length
+    scored = [i for i in sources if i in scores]
+    final_score = sum(scores[i] * len(sources[i]) for i in scored) / max(sum(len(sources[i]) for i in scored), 1)
+    accepted = [i for i in pending if scores.get(i, 0) >= quality_threshold]
+
+    if memory is not None:
+        memory.record_tokens(usage["total_tokens"])
+        # each accepted segment is charged its share of the tokens by length
+        pending_chars = sum(len(segment) for segment in pending.values())
+        for segment_id in accepted:
+            memory.add(sources[segment_id], target_language, source_language, translations[segment_id],
+                       scores[segment_id], usage["total_tokens"] * len(sources[segment_id]) // pending_chars)
+
+    return {
+        "final_translation": join_segments(layout, translations),
+        "final_score": final_score,
+        "total_iterations": len(iterations),
+        "iterations": iterations,
+        "initial_tokens": initial_tokens,
+        "total_tokens": usage["total_tokens"],
+        "memory": dict(memory_matches) if memory else None,
+        "segments": [
+            {"source": sources[i], "translation": translations[i], "score": scores.get(i),
+             "accepted": scores.get(i, 0) >= quality_threshold}
+            for i in sources
+        ],
+    }
+
+
+class RateLimiter:
+    """
+    Spaces LLM requests evenly so that all concurrent translations together stay
+    under `requests_per_minute`
+    """
+    def __init__(self, requests_per_minute: float):
+        self.interval = 60.0 / requests_per_minute
+        self.next_slot = 0.0
+        self.lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            now = time.monotonic()
+            wait = self.next_slot - now
+            self.next_slot = max(now, self.next_slot) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+async def aparse(messages: List[Dict], response_format, limiter: Optional[RateLimiter] = None,
+                 usage: Optional[Dict[str, int]] = None):
+    """Async structured-output call, waiting for a rate-limit slot first"""
+    if limiter is not None:
+        await limiter.acquire()
+    completion = await async_client.beta.chat.completions.parse(
+        model=model,
+        messages=messages,
+        response_format=response_format
+    )
+    record_usage(completion, usage)
+    return completion.choices[0].message.parsed
+
+
+async def aevaluator_optimizer_translation(source_text: str, target_language: str, source_language: str="English",
+    max_iterations: int=3, quality_threshold: float = 7, limiter: Optional[RateLimiter] = None,
+    memory: Optional[TranslationMemory] = None) -> Dict:
+    """
+    Async version of evaluator_optimizer_translation, so many texts can be translated concurrently.
+
+    Args:
+        source_text: Text to translate
+        target_language: Target language for translation
+        source_language: Source language (default: English)
+        max_iterations: Maximum number of optimization iterations
+        quality_threshold: Minimum score to consider translation satisfactory
+        limiter: Shared rate limiter for the LLM calls
+        memory: Translation memory consulted before and updated after translating
+
+    Returns:
+        Dictionary with final translation and process history
+    """
+    if max_iterations < 1:
+        raise ValueError(f"max_iterations must be at least 1, got {max_iterations}")
+    match, entry = memory.lookup(source_text, target_language, source_language, quality_threshold) if memory else ("miss", None)
+    if match == "exact":
+        return memory_result(entry)
+    reference = (entry["source_text"], entry["translation"]) if match == "fuzzy" else None
+    usage = {"total_tokens": 0}
+
+    current_translation = await aparse(
+        translation_messages(source_text, target_language, source_language, reference),
+        TranslationResponse, limiter, usage
+    )
+
+    iterations = []
+    while len(iterations) < max_iterations:
+        evaluation = await aparse(
+            evaluation_messages(source_text, current_translation.translated_text, target_language, source_language),
+            TranslationEvaluation, limiter, usage
+        )
+        iteration_data = {
+            "iteration": len(iterations) + 1,
+            "translation": current_translation.translated_text,
+            "evaluation": evaluation,
+            "optimization": None
+        }
+        iterations.append(iteration_data)
+
+        if evaluation.is_satisfactory and evaluation.overall_score >= quality_threshold:
+            iteration_data["final"] = True
+            break
+
+        if len(iterations) < max_iterations:
+            optimization = await aparse(
+                optimization_messages(source_text, current_translation.translated_text, evaluation,
+                                      target_language, source_language),
+                OptimizedTranslation, limiter, usage
+            )
+            iteration_data["optimization"] = optimization
+            current_translation = TranslationResponse(
+                translated_text=optimization.improved_text,
+                reasoning=optimization.reasoning
+            )
+
+    result = {
+        "final_translation": iterations[-1]["translation"],
+        "final_score": iterations[-1]["evaluation"].overall_score,
+        "total_iterations": len(iterations),
+        "iterations": iterations,
+        "total_tokens": usage["total_tokens"],
+        "memory": None if match == "miss" else match,
+    }
+    remember(memory, source_text, target_language, source_language, result)
+    return result
+
+
+async def abest_of_n_translation(source_text: str, target_language: str, source_language: str="English",
+    n: int = 4, quality_threshold: float = 7, optimize_winner: bool = True,
+    limiter: Optional[RateLimiter] = None, memory: Optional[TranslationMemory] = None) -> Dict:
+    """
+    Best-of-N alternative to the iterative evaluator-optimizer loop
+
+    Generates `n` candidate translations concurrently, then scores all of them in one
+    comparative evaluation call that returns a ranking. If the winner is still below
+    `quality_threshold`, one optimize pass addresses its feedback. That is two or three
+    serialized round trips instead of up to 2 * max_iterations, at the cost of more tokens.
+
+    Args:
+        source_text: Text to translate
+        target_language: Target language for translation
+        source_language: Source language (default: English)
+        n: Number of candidates generated concurrently
+        quality_threshold: Minimum score to consider translation satisfactory
+        optimize_winner: Whether to run an optimize pass on a winner below the threshold
+        limiter: Shared rate limiter for the LLM calls
+        memory: Translation memory consulted before and updated after translating
+
+    Returns:
+        Dictionary with final translation, the ranked candidates and process history. The
+        optimized text is never evaluated, so when the optimize pass ran `final_score` is
+        None and the score of the candidate it started from is in `winner_score`
+    """
+    match, entry = memory.lookup(source_text, target_language, source_language, quality_threshold) if memory else ("miss", None)
+    if match == "exact":
+        return memory_result(entry)
+    reference = (entry["source_text"], entry["translation"]) if match == "fuzzy" else None
+    usage = {"total_tokens": 0}
+
+    logger.info(f"Generating {n} candidate translations concurrently")
+    candidates = await asyncio.gather(*[
+        aparse(candidate_messages(source_text, target_language, source_language, candidate_id, reference),
+               TranslationResponse, limiter, usage)
+        for candidate_id in range(n)
+    ])
+    texts = [candidate.translated_text for candidate in candidates]
+
+    comparison = await aparse(comparative_evaluation_messages(source_text, texts, target_language, source_language),
+                              CandidateRanking, limiter, usage)
+    # the scores decide, not the order the model listed the candidates in
+    ranking = sorted((evaluation for evaluation in comparison.ranking if 0 <= evaluation.candidate_id < n),
+                     key=lambda evaluation: evaluation.overall_score, reverse=True)
+    if not ranking:
+        raise ValueError("Comparative evaluation did not score any candidate")
+    winner = ranking[0]
+    logger.info(f"Candidate {winner.candidate_id} won with score {winner.overall_score:.1f} "
+                f"(scores: {', '.join(f'{e.candidate_id}={e.overall_score:.1f}' for e in ranking)})")
+
+    iteration_data = {
+        "iteration": 1,
+        "translation": texts[winner.candidate_id],
+        "evaluation": winner,
+        "optimization": None,
+    }
+    final_translation = iteration_data["translation"]
+
+    if winner.overall_score >= quality_threshold:
+        iteration_data["final"] = True
+    elif optimize_winner:
+        logger.info("Winner below threshold, optimizing it...")
+        optimization = await aparse(
+            optimization_messages(source_text, final_translation, winner, target_language, source_language),
+            OptimizedTranslation, limiter, usage
+        )
+        iteration_data["optimization"] = optimization
+        final_translation = optimization.improved_text
+
+    result = {
+        "final_translation": final_translation,
+        "final_score": None if iteration_data["optimization"] is not None else winner.overall_score,
+        "winner_score": winner.overall_score,
+        "total_iterations": 1,
+        "iterations": [iteration_data],
+        "candidates": [{"candidate_id": e.candidate_id, "translation": texts[e.candidate_id],
+                        "score": e.overall_score} for e in ranking],
+        "round_trips": 3 if iteration_data["optimization"] is not None else 2,
+        "total_tokens": usage["total_tokens"],
+        "memory": None if match == "miss" else match,
+    }
+    remember(memory, source_text, target_language, source_language, result)
+    return result
+
+
+async def compare_strategies(texts: List[str], target_language: str, source_language: str = "English",
+                             n: int = 4, max_iterations: int = 3, quality_threshold: float = 7) -> List[Dict]:
+    """
+    Runs the iterative loop and best-of-n on the same texts and reports latency, tokens
+    and quality. Both final translations are re-scored by the same independent
+    evaluation, since the loop and the comparative ranking score on different scales.
+    """
+    rows = []
+    for source_text in texts:
+        row = {"text": source_text.strip()[:40]}
+        for name, strategy in (
+            ("iterative", aevaluator_optimizer_translation(source_text, target_language, source_language,
+                                                           max_iterations, quality_threshold)),
+            ("best_of_n", abest_of_n_translation(source_text, target_language, source_language,
+                                                 n, quality_threshold)),
+        ):
+            start = time.perf_counter()
+            result = await strategy
+            latency = time.perf_counter() - start
+            judged = await aparse(
+                evaluation_messages(source_text, result["final_translation"], target_language, source_language),
+                TranslationEvaluation
+            )
+            round_trips = result.get("round_trips") or 1 + sum(
+                1 + (iteration["optimization"] is not None) for iteration in result["iterations"]
+            )
+            row[name] = {"latency": latency, "round_trips": round_trips,
+                         "tokens": result["total_tokens"], "score": judged.overall_score}
+        rows.append(row)
+
+    print(f"\n{'text':<42}{'strategy':<12}{'latency':>10}{'trips':>7}{'tokens':>9}{'score':>7}")
+    print("---"*29)
+    for row in rows:
+        for name in ("iterative", "best_of_n"):
+            stats = row[name]
+            print(f"{row['text']:<42}{name:<12}{stats['latency']:>9.1f}s{stats['round_trips']:>7}"
+                  f"{stats['tokens']:>9}{stats['score']:>7.1f}")
+    for name in ("iterative", "best_of_n"):
+        latencies = [row[name]["latency"] for row in rows]
+        scores = [row[name]["score"] for row in rows]
+        print(f"{name}: mean latency {sum(latencies) / len(rows):.1f}s, mean score {sum(scores) / len(rows):.2f}, "
+              f"{sum(row[name]['tokens'] for row in rows)} tokens")
+    return rows
+
+
+def item_key(source_text: str, target_language: str, source_language: str) -> str:
+    """Stable id of a batch item, used to skip already translated items when resuming"""
+    return hashlib.sha256(f"{source_language}\0{target_language}\0{source_text}".encode()).hexdigest()[:16]
+
+
+def load_checkpoint(checkpoint_path: str) -> Dict[str, Dict]:
+    """Reads the results completed by an earlier, possibly interrupted, run"""
+    completed = {}
+    if not os.path.exists(checkpoint_path):
+        return completed
+    with open(checkpoint_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # a line cut short by the interruption, that item is simply redone
+                continue
+            completed[result["key"]] = result
+    return completed
+
+
+async def translate_batch(items: Iterable[Tuple[str, str]], source_language: str = "English",
+                          max_iterations: int = 3, quality_threshold: float = 7,
+                          concurrency: int = 8, requests_per_minute: float = 500,
+                          checkpoint_path: Optional[str] = None,
+                          memory: Optional[TranslationMemory] = None) -> AsyncIterator[Dict]:
+    """
+    Translates many (text, target_language) items concurrently, each with its own
+    evaluator-optimizer loop, and yields every result as soon as it is finished.
+
+    At most `concurrency` items are in flight, and all their LLM calls together stay under
+    `requests_per_minute`. With a checkpoint file, every finished result is appended to it,
+    and a rerun after an interruption yields the saved results first and only translates
+    the remaining items.
+
+    Args:
+        items: (source_text, target_language) pairs
+        source_language: Source language of every item
+        max_iterations: Maximum number of optimization iterations per item
+        quality_threshold: Minimum score to consider a translation satisfactory
+        concurrency: Maximum number of items translated at once
+        requests_per_minute: Rate limit shared by all LLM calls
+        checkpoint_path: JSONL file recording finished results
+        memory: Translation memory shared by all items
+
+    Yields:
+        A dictionary per item with its key, source text, target language, final translation,
+        final score and number of iterations, or an "error" entry if it failed
+    """
+    if max_iterations < 1:
+        raise ValueError(f"max_iterations must be at least 1, got {max_iterations}")
+    completed = load_checkpoint(checkpoint_path) if checkpoint_path else {}
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = RateLimiter(requests_per_minute)
+
+    pending = {}
+    for source_text, target_language in items:
+        key = item_key(source_text, target_language, source_language)
+        if key in completed:
+            continue
+        pending[key] = (source_text, target_language)
+
+    if completed:
+        logger.info(f"Resuming batch: {len(completed)} items already done, {len(pending)} remaining")
+        for result in completed.values():
+            yield {**result, "resumed": True}
+
+    async def translate_item(key: str, source_text: str, target_language: str) -> Dict:
+        async with semaphore:
+            try:
+                result = await aevaluator_optimizer_translation(
+                    source_text, target_language, source_language, max_iterations, quality_threshold, limiter, memory
+                )
+            except Exception as e:
+                logger.error(f"Translation of item {key} to {target_language} failed: {e}")
+                return {"key": key, "source_text": source_text, "target_language": target_language, "error": str(e)}
+        return {
+            "key": key,
+            "source_text": source_text,
+            "target_language": target_language,
+            "final_translation": result["final_translation"],
+            "final_score": result["final_score"],
+            "total_iterations": result["total_iterations"],
+            "total_tokens": result["total_tokens"],
+            "memory": result["memory"],
+        }
+
+    checkpoint = open(checkpoint_path, "a", encoding="utf-8") if checkpoint_path else None
+    tasks = [asyncio.create_task(translate_item(key, *item)) for key, item in pending.items()]
+    try:
+        for finished in asyncio.as_completed(tasks):
+            result = await finished
+            # failed items are not checkpointed, so a rerun retries them
+            if checkpoint is not None and "error" not in result:
+                checkpoint.write(json.dumps(result, ensure_ascii=False) + "\n")
+                checkpoint.flush()
+            yield result
+    finally:
+        for task in tasks:
+            task.cancel()
+        if checkpoint is not None:
+            checkpoint.close()
+
+
+async def run_batch(input_path: str, checkpoint_path: str, concurrency: int, requests_per_minute: float,
+                    memory: Optional[TranslationMemory] = None):
+    """Translates a JSONL file of {"text": ..., "target_language": ...} lines"""
+    with open(input_path, encoding="utf-8") as f:
+        # blank lines, e.g. a trailing newline at the end of the file, are skipped before parsing
+        records = [json.loads(line) for line in f if line.strip()]
+    items = [(record["text"], record["target_language"]) for record in records]
+
+    start = time.perf_counter()
+    done = failed = 0
+    async for result in translate_batch(items, concurrency=concurrency, requests_per_minute=requests_per_minute,
+                                        checkpoint_path=checkpoint_path, memory=memory):
+        if "error" in result:
+            failed += 1
+        else:
+            done += 1
+        logger.info(f"[{done + failed}/{len(items)}] {result['target_language']}: "
+                    f"{result.get('final_translation', result.get('error'))[:60]!r}")
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"Batch finished: {done} translated, {failed} failed in {elapsed:.1f}s")
+    if memory is not None:
+        stats = memory.stats()
+        logger.info(f"Translation memory: {stats['hit_rate']:.0%} hit rate ({stats['exact_hits']} exact, "
+                    f"{stats['fuzzy_hits']} fuzzy), {stats['tokens_saved']} tokens saved, "
+                    f"{stats['tokens_spent']} spent")
+
+
 if __name__ == "__main__":
-    # exmpale 1. literary translation with cultural nuances
+    parser = argparse.ArgumentParser(description="Evaluator-optimizer translation")
+    parser.add_argument("--batch", help="JSONL file of {\"text\": ..., \"target_language\": ...} items to translate")
+    parser.add_argument("--checkpoint", default="translations.checkpoint.jsonl",
+                        help="Finished batch results are appended here; rerun with the same file to resume")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rpm", type=float, default=500, help="Maximum LLM requests per minute")
+    parser.add_argument("--memory", default="translation_memory.sqlite",
+                        help="Translation memory reused across runs; pass an empty string to disable it")
+    parser.add_argument("--document", help="Text file to translate segment by segment")
+    parser.add_argument("--target-language", default="French", help="Target language for --document")
+    parser.add_argument("--segment-by", choices=sorted(SEGMENT_BOUNDARIES), default="paragraph")
+    parser.add_argument("--quality-threshold", type=float, default=8)
+    parser.add_argument("--compare", action="store_true",
+                        help="Compare the iterative loop with best-of-n on the example texts")
+    parser.add_argument("--candidates", type=int, default=4, help="Number of best-of-n candidates")
+    args = parser.parse_args()
+
+    memory = TranslationMemory(args.memory) if args.memory else None
+
+    # example texts
     source_text="""
     The old man sate by the window, wathcing the rain dance on the cobblestones. His weathered hands
     held a cup of tea that had long grown cold, but he didn't notice. In his mind, he was young again,
     walking those same streets with here, when the world was full of promise and their love felt eternal.
     """
+    technical_text = """
+    The machine learning model exhibited overfitting behavior, achieving 99% 
+    accuracy on the training dataset but only 65% 
+    on the validatioun set.
+    This performance gap  suggests the need for regularization techniques sucha as 
+    dropout or L2 penalty
+    """
+
+    if args.compare:
+        asyncio.run(compare_strategies([source_text, technical_text], "French", n=args.candidates,
+                                       quality_threshold=args.quality_threshold))
+        raise SystemExit
+
+    if args.batch:
+        asyncio.run(run_batch(args.batch, args.checkpoint, args.concurrency, args.rpm, memory))
+        raise SystemExit
+
+    if args.document:
+        with open(args.document, encoding="utf-8") as f:
+            document = f.read()
+        result = segmented_evaluator_optimizer_translation(
+            source_text=document,
+            target_language=args.target_language,
+            segment_by=args.segment_by,
+            quality_threshold=args.quality_threshold,
+            memory=memory
+        )
+        print(f"\n FINAL RESULT")
+        print(f"\n Final translation: {result['final_translation']}")
+        print(f"\n Segments accepted: {sum(s['accepted'] for s in result['segments'])}/{len(result['segments'])}")
+        print(f"\n Final Score: {result['final_score']:.1f}/10")
+        print(f"\n Tokens: {result['initial_tokens']} initial translation, "
+              f"{[iteration['tokens'] for iteration in result['iterations']]} per iteration")
+        raise SystemExit
+
+    # exmpale 1. literary translation with cultural nuances
     result = evaluator_optimizer_translation(
         source_text=source_text,
         target_language="French",
         source_language="English",
         max_iterations=3,
-        quality_threshold=9
+        quality_threshold=9,
+        memory=memory
     )
 
     print(f"\n FINAL RESULT")
-    print(f"\n Final translation: {result["final_translation"]}")
-    print(f"\n Total Iterations: {result["total_iterations"]}")
-    print(f"\n Final Score: {result["final_score"]:.1f}/10")
+    print(f"\n Final translation: {result['final_translation']}")
+    print(f"\n Total Iterations: {result['total_iterations']}")
+    print(f"\n Final Score: {result['final_score']:.1f}/10")
 
     # example 2: technical text with specific terminology
-    technical_text = """
-    The machine learning model exhibited overfitting behavior, achieving 99% 
-    accuracy on the training dataset but only 65% 
-    on the validatioun set.
-    This performance gap  suggests the need for regularization techniques sucha as 
-    dropout or L2 penalty
-    """
-
     result_technical = evaluator_optimizer_translation(
         source_text=source_text,
         target_language="Spanish",
         source_language="English",
         max_iterations=2,
-        quality_threshold=9.5
+        quality_threshold=9.5,
+        memory=memory
     )
 
     print(f"\n FINAL RESULT")
-    print(f"\n Final translation: {result_technical["final_translation"]}")
-    print(f"\n Total Iterations: {result_technical["total_iterations"]}")
-    print(f"\n Final Score: {result_technical["final_score"]:.1f}/10")
+    print(f"\n Final translation: {result_technical['final_translation']}")
+    print(f"\n Total Iterations: {result_technical['total_iterations']}")
+    print(f"\n Final Score: {result_technical['final_score']:.1f}/10")
+
+    if memory is not None:
+        print(f"\n Translation memory: {memory.stats()}")
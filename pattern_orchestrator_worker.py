@@ -1,7 +1,14 @@
-from pydantic import Field, BaseModel, List
-from typing import Dict
-from openai import OpenAI
+from pydantic import Field, BaseModel
+from typing import Dict, Iterable, List, Optional, Type, TypeVar
+from openai import OpenAI, AsyncOpenAI
+import argparse
+import asyncio
+import hashlib
+import json
 import logging
+import os
+import re
+import time
 
 client = OpenAI(
     api_key=("{{OPENAPI_API_KEY}}")
@@ -21,6 +28,9 @@ class ResearchTask(BaseModel):
     research_focus: str = Field(description="What this analysis shoudl investigate")
     methodology: str = Field(description="Research approach for this section")
     depth_level: str = Field(description="Level of detail required (high/medium/low)")
+    depends_on: List[str] = Field(
+        description="Analysis types of the other sections whose findings this section needs, empty if it is independent"
+    )
 
 class OrchestratorPlan(BaseModel):
     market_overview: str = Field(description="High-level market context and scope")
@@ -75,6 +85,10 @@ break down into specific research tasks
 - Research focus: what to investigate
 - Methodology: research approach
 - Depth level: high/medium/low
+- Depends on: analysis types of the sections whose findings this one genuinely needs (empty if independent)
+
+Only declare a dependency when the section cannot be researched without the other one's results,
+independent sections are researched in parallel.
 
 [Additional sections as needed - typically 4-6 sections covering competitive landscape, market sizing, trends, customer analysis etc]
 """
@@ -134,9 +148,139 @@ Produce a final polished report that integrates all sections coherently
 
 """
 
+def estimate_tokens(text: str) -> int:
+    # about four characters per token for english text
+    return len(text) // 4
+
+
+class FindingsDigest:
+    """
+    Compact, token-budgeted digest of the findings of the sections finished so far.
+
+    Workers get the full findings of the sections they depend on plus this digest of
+    everything else, instead of every earlier section joined together, so the context
+    of a worker call stays bounded however many sections the plan has.
+
+    The digest is updated incrementally as each section finishes. Insights and data
+    points that repeat, or nearly repeat, something already in the digest are skipped.
+    Near-repeats are judged on their sets of words and must quote the same numbers, so
+    "grew 35%" and "grew 53%" are both kept.
+    Once over `max_tokens`, the last item of the section holding the most items is
+    dropped, so every section keeps its leading insights.
+
+    Args:
+        max_tokens: Token budget of the rendered digest
+        similarity_threshold: Items sharing at least this fraction (0-1) of their words with a
+            kept item, and quoting the same numbers, are duplicates
+    """
+    def __init__(self, max_tokens: int = 800, similarity_threshold: float = 0.85):
+        self.max_tokens = max_tokens
+        self.similarity_threshold = similarity_threshold
+        self.sections: Dict[str, List[str]] = {}
+        self.keys: List[str] = []
+
+    @staticmethod
+    def normalize(item: str) -> str:
+        return " ".join(re.sub(r"[^\w%$.]+", " ", item.lower()).split())
+
+    def is_duplicate(self, key: str) -> bool:
+        words = set(key.split())
+        numbers = re.findall(r"\d+(?:[.,]\d+)*", key)
+        for kept in self.keys:
+            if key == kept:
+                return True
+            # items quoting different figures are never duplicates, however alike their wording
+            if re.findall(r"\d+(?:[.,]\d+)*", kept) != numbers:
+                continue
+            kept_words = set(kept.split())
+            if len(words & kept_words) / len(words | kept_words) >= self.similarity_threshold:
+                return True
+        return False
+
+    def add(self, section: str, findings: ResearchFindings):
+        items = []
+        for item in findings.key_insights + findings.data_points:
+            key = self.normalize(item)
+            if key and not self.is_duplicate(key):
+                self.keys.append(key)
+                items.append(item.strip())
+        self.sections[section] = items
+
+        while estimate_tokens(self.render()) > self.max_tokens:
+            largest = max(self.sections.values(), key=len)
+            if not largest:
+                break
+            self.keys.remove(self.normalize(largest.pop()))
+
+    def render(self, exclude: Iterable[str] = ()) -> str:
+        """The digest without the sections in `exclude`, which the worker gets in full"""
+        exclude = set(exclude)
+        return "\n\n".join(
+            f"=== {section} (digest) ===\n" + "\n".join(f"- {item}" for item in items)
+            for section, items in self.sections.items()
+            if section not in exclude and items
+        )
+
+
+Stage = TypeVar("Stage", bound=BaseModel)
+
+
+class RunCheckpoint:
+    """
+    Persists the result of every stage of a research run (the plan, each section's
+    findings and the review) to a run directory as soon as the stage completes.
+
+    The directory is keyed by a hash of the run inputs and the model, so rerunning
+    the same research after a crash or rate-limit error resumes from the completed
+    stages instead of repeating their LLM calls. In replay mode nothing is computed:
+    every stage must come from the cache, which makes runs reproducible and free
+    for testing.
+
+    Args:
+        inputs: Everything the run depends on, hashed to name the run directory
+        root: Directory holding one subdirectory per run
+        replay: Serve every stage from the cache, failing if one is missing
+    """
+    def __init__(self, inputs: Dict, root: str = "research_runs", replay: bool = False):
+        key = hashlib.sha256(json.dumps({**inputs, "model": model}, sort_keys=True).encode()).hexdigest()[:16]
+        self.path = os.path.join(root, key)
+        self.replay = replay
+        if not replay:
+            os.makedirs(self.path, exist_ok=True)
+            with open(os.path.join(self.path, "inputs.json"), "w", encoding="utf-8") as f:
+                json.dump(inputs, f, indent=2)
+
+    def stage_path(self, stage: str) -> str:
+        return os.path.join(self.path, re.sub(r"[^\w.-]+", "_", stage) + ".json")
+
+    def load(self, stage: str, response_format: Type[Stage]) -> Optional[Stage]:
+        path = self.stage_path(stage)
+        if not os.path.exists(path):
+            if self.replay:
+                raise FileNotFoundError(f"Replay mode: stage '{stage}' was never completed in {self.path}")
+            return None
+        with open(path, encoding="utf-8") as f:
+            result = response_format.model_validate_json(f.read())
+        logger.info(f"Loaded stage '{stage}' from {self.path}")
+        return result
+
+    def save(self, stage: str, result: BaseModel):
+        # written to a temporary file first, so a crash never leaves a half-written stage behind
+        path = self.stage_path(stage)
+        with open(path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(result.model_dump_json(indent=2))
+        os.replace(path + ".tmp", path)
+
+
 class MarketResearchOrchestrator:
-    def __init__(self):
+    def __init__(self, digest_max_tokens: int = 800, runs_dir: str = "research_runs", replay: bool = False):
+        self.digest_max_tokens = digest_max_tokens
         self.research_findings = {}
+        self.digest = FindingsDigest(digest_max_tokens)
+        self.token_usage: Dict[str, Dict[str, int]] = {}
+        self.runs_dir = runs_dir
+        self.replay = replay
+        self.checkpoint: Optional[RunCheckpoint] = None
 
     def create_research_plan(self, market: str, scope: str, context: str, timeline: str) -> OrchestratorPlan:
         """Get orchestrator's market research plan"""
@@ -154,15 +298,20 @@ class MarketResearchOrchestrator:
         )
         return completion.choices[0].message.parsed 
 
-    def conduct_analysis(self, market: str, task: ResearchTask) -> ResearchFindings:
-        """Worker: conduct specific market research analysis with context from previous findings"""
+    async def conduct_analysis(self, async_client: AsyncOpenAI, market: str, task: ResearchTask,
+                               dependencies: Dict[str, ResearchFindings]) -> ResearchFindings:
+        """
+        Worker: conduct specific market research analysis with the full findings of the sections
+        it depends on and the digest of the other finished sections as context
+        """
         previous_context = "\n\n".join(
             [
                 f"==={analysis_type} === \nKey Insights: {findings.key_insights}\nData: {findings.data_points}"
-                for analysis_type, findings in self.research_findings.items()
+                for analysis_type, findings in dependencies.items()
             ]
-        )
-        completion = client.beta.chat.completions.parse(
+            + [self.digest.render(exclude=dependencies)]
+        ).strip()
+        completion = await async_client.beta.chat.completions.parse(
             model=model, 
             messages=[
                 {
@@ -173,14 +322,109 @@ class MarketResearchOrchestrator:
                         research_focus=task.research_focus,
                         methodology=task.methodology, 
                         depth_level=task.depth_level, 
-                        previous_findings=previous_context if previous_context else "This is the first analysis section"
+                        previous_findings=previous_context if previous_context else "No findings from other sections are available yet"
                     )
                 }
             ],
             response_format=ResearchFindings,
         )
+        usage = completion.usage
+        self.token_usage[task.analysis_type] = {
+            "context_tokens": estimate_tokens(previous_context),
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+        }
+        logger.info(f"{task.analysis_type}: {usage.prompt_tokens} prompt tokens "
+                    f"(~{estimate_tokens(previous_context)} of context), {usage.completion_tokens} completion tokens")
         return completion.choices[0].message.parsed
     
+    def section_dependencies(self, plan: OrchestratorPlan) -> Dict[str, List[str]]:
+        """
+        Dependency graph of the plan's sections. Unknown section names are dropped, and if
+        the declared dependencies form a cycle, only dependencies on earlier sections are kept.
+        """
+        names = [task.analysis_type for task in plan.analysis_sections]
+        graph = {}
+        for task in plan.analysis_sections:
+            unknown = [name for name in task.depends_on if name not in names or name == task.analysis_type]
+            if unknown:
+                logger.warning(f"{task.analysis_type}: ignoring unknown dependencies {unknown}")
+            graph[task.analysis_type] = [name for name in dict.fromkeys(task.depends_on) if name not in unknown]
+
+        # kahn's algorithm, every section must become ready at some point
+        remaining = {name: set(deps) for name, deps in graph.items()}
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                logger.warning(f"Dependency cycle between {sorted(remaining)}, keeping only dependencies on earlier sections")
+                return {name: [dep for dep in deps if names.index(dep) < names.index(name)]
+                        for name, deps in graph.items()}
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return graph
+
+    async def run_sections(self, market: str, plan: OrchestratorPlan, max_concurrency: int = 6) -> Dict:
+        """
+        Runs the plan's sections as a DAG: every section starts as soon as the sections it
+        depends on have finished, independent sections run concurrently.
+
+        Args:
+            market: Market being researched
+            plan: Research plan with the sections and their dependencies
+            max_concurrency: Maximum number of worker calls in flight
+
+        Returns:
+            Timing of the run: wall-clock seconds, the serial baseline (sum of the section
+            latencies) and the latency of every section
+        """
+        graph = self.section_dependencies(plan)
+        semaphore = asyncio.Semaphore(max_concurrency)
+        sections: Dict[str, asyncio.Task] = {}
+        latencies: Dict[str, float] = {}
+        start = time.perf_counter()
+
+        async def run_section(index: int, task: ResearchTask) -> ResearchFindings:
+            stage = f"section-{index}-{task.analysis_type}"
+            findings = self.checkpoint.load(stage, ResearchFindings) if self.checkpoint else None
+            if findings is not None:
+                self.digest.add(task.analysis_type, findings)
+                return findings
+
+            dependencies = {name: await sections[name] for name in graph[task.analysis_type]}
+            async with semaphore:
+                logger.info(f"Conducting analysis: {task.analysis_type}"
+                            + (f" (after {', '.join(dependencies)})" if dependencies else ""))
+                section_start = time.perf_counter()
+                findings = await self.conduct_analysis(async_client, market, task, dependencies)
+                latencies[task.analysis_type] = time.perf_counter() - section_start
+            if self.checkpoint:
+                self.checkpoint.save(stage, findings)
+            self.digest.add(task.analysis_type, findings)
+            return findings
+
+        # workers run concurrently on an async client that is bound to this run's event loop,
+        # so it is created here rather than at import time
+        async with AsyncOpenAI(api_key=("{{OPENAPI_API_KEY}}")) as async_client:
+            for index, task in enumerate(plan.analysis_sections):
+                sections[task.analysis_type] = asyncio.create_task(run_section(index, task))
+            try:
+                await asyncio.gather(*sections.values())
+            finally:
+                for section in sections.values():
+                    section.cancel()
+
+        # findings are kept in plan order, not completion order
+        for task in plan.analysis_sections:
+            self.research_findings[task.analysis_type] = sections[task.analysis_type].result()
+
+        wall_clock = time.perf_counter() - start
+        serial = sum(latencies.values())
+        logger.info(f"{len(sections)} sections done in {wall_clock:.1f}s wall-clock, "
+                    f"{serial:.1f}s serial baseline ({serial / wall_clock:.1f}x)")
+        return {"wall_clock": wall_clock, "serial_baseline": serial, "section_latencies": latencies}
+
     def review_report(self, market: str, plan: OrchestratorPlan) -> FinalReview:
         """Reviewer: Analyze research quality and create final report"""
         sections_text = "\n\n".join(
@@ -211,34 +455,56 @@ class MarketResearchOrchestrator:
         market:str, 
         scope: str = "comprehensive analysis",
         context: str = "strategic planning",
-        timeline: str = "Q1 2025"
+        timeline: str = "Q1 2025",
+        max_concurrency: int = 6
     ) -> Dict:
-        """Plan the entire market research task"""
+        """Plan the entire market research task, resuming from any stages a previous run completed"""
         logger.info(f"Starting market research for: {market}")
+        # every run starts from a clean slate, earlier runs' findings are not finished sections of this one
+        self.research_findings = {}
+        self.digest = FindingsDigest(self.digest_max_tokens)
+        self.token_usage = {}
+        self.checkpoint = RunCheckpoint(
+            {"market": market, "scope": scope, "context": context, "timeline": timeline},
+            self.runs_dir, self.replay
+        )
+        logger.info(f"Run directory: {self.checkpoint.path}")
 
         # create research plan
-        plan =  self.create_research_plan(market, scope, context, timeline)
+        plan = self.checkpoint.load("plan", OrchestratorPlan)
+        if plan is None:
+            plan = self.create_research_plan(market, scope, context, timeline)
+            self.checkpoint.save("plan", plan)
         logger.info(f"Research plan created: {len(plan.analysis_sections)} analysis sections")
 
-        # conduct each analysis section
-        for task in plan.analysis_sections:
-            logger.info(f"Conducting analysis: {task.analysis_type}")
-            findings = self.conduct_analysis(market, task)
-            self.research_findings[task.analysis_type] = findings 
+        # conduct the analysis sections, independent ones concurrently
+        timing = asyncio.run(self.run_sections(market, plan, max_concurrency))
 
         # Review and synthesize final report
-        logger.info("Reviewing and synthesizing final report")
-        final_review = self.review_report(market, plan)
+        final_review = self.checkpoint.load("review", FinalReview)
+        if final_review is None:
+            logger.info("Reviewing and synthesizing final report")
+            final_review = self.review_report(market, plan)
+            self.checkpoint.save("review", final_review)
 
 
         return {
             "research_plan": plan, 
             "findings": self.research_findings,
-            "final_review": final_review
+            "final_review": final_review,
+            "timing": timing,
+            "token_usage": self.token_usage
         }
     
 if __name__ == "__main__":
-    orchestrator = MarketResearchOrchestrator()
+    parser = argparse.ArgumentParser(description="Orchestrator-worker market research")
+    parser.add_argument("--runs-dir", default="research_runs",
+                        help="Completed stages are stored here; rerunning the same research resumes from them")
+    parser.add_argument("--replay", action="store_true",
+                        help="Serve every stage from the run directory without calling the LLM")
+    args = parser.parse_args()
+
+    orchestrator = MarketResearchOrchestrator(runs_dir=args.runs_dir, replay=args.replay)
 
     # example: Electric vehicle charging infrastructure market 
     market = "Electric Vehicle Charging Infrastructure"
@@ -265,4 +531,13 @@ if __name__ == "__main__":
     if result["final_review"].section_improvements:
         print("\nSuggested Improvements:")
         for improvement in result["final_review"].section_improvements:
-            print(f"- {improvement.section_name} ({improvement.priority}): {improvement.improvement_suggestion}")
\ No newline at end of file
+            print(f"- {improvement.section_name} ({improvement.priority}): {improvement.improvement_suggestions}")
+
+    print("\nWorker tokens:")
+    for section, usage in result["token_usage"].items():
+        print(f"- {section}: {usage['prompt_tokens']} prompt (~{usage['context_tokens']} context), "
+              f"{usage['completion_tokens']} completion")
+
+    timing = result["timing"]
+    print(f"\nSections: {timing['wall_clock']:.1f}s wall-clock vs {timing['serial_baseline']:.1f}s serial "
+          f"({timing['serial_baseline'] / timing['wall_clock']:.1f}x)")
\ No newline at end of file
@@ -1,7 +1,10 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple
 from pydantic import BaseModel, Field
-from openai import OpenAI
+from openai import OpenAI, AsyncOpenAI
+import argparse
+import asyncio
 import logging
+import time
 
 logging.basicConfig(
     level=logging.INFO, 
@@ -13,7 +16,7 @@ logger = logging.getLogger(__name__)
 client = OpenAI(
     api_key=("{{OPENAPI_API_KEY}}")
 )
-model="gpt-4.1",
+model="gpt-4.1"
 
 class DocumentOutline(BaseModel):
     """
@@ -97,6 +100,7 @@ def validate_document_outline(outline: DocumentOutline) -> OutlineValidation:
     logger.info("Starting outline validation")
 
     completion = client.beta.chat.completions.parse(
+        model=model,
         messages=[
             {
                 "role": "system",
@@ -128,6 +132,25 @@ def validate_document_outline(outline: DocumentOutline) -> OutlineValidation:
     return result
 
 # third agent. generate the final document
+def final_document_messages(outline: DocumentOutline) -> List[dict]:
+    """Prompt of the third LLM call, shared by the blocking and the speculative path"""
+    return [
+        {
+            "role": "system",
+            "content": (
+                """
+                You are a skilled author.
+                Write a comprehensive, well-structured document based on the provided outline.
+                Include an engaging title, clear section headings, and a concise conclusion
+                """
+            )
+        },
+        {
+            "role":"user",
+            "content": str(outline.model_dump())
+        }
+    ]
+
 def generate_final_document(outline: DocumentOutline) -> FinalDocument:
     """
     Third LLM call: expand the validated outline into a full document
@@ -141,22 +164,7 @@ def generate_final_document(outline: DocumentOutline) -> FinalDocument:
 
     completion = client.beta.chat.completions.parse(
         model=model, 
-        messages=[
-            {
-                "role": "system",
-                "content": (
-                    """
-                    You are a skilled author.
-                    Write a comprehensive, well-structured document based on the provided outline.
-                    Include an engaging title, clear section headings, and a concise conclusion
-                    """
-                )
-            },
-            {
-                "role":"user",
-                "content": str(outline.model_dump())
-            }
-        ],
+        messages=final_document_messages(outline),
         response_format=FinalDocument,
     )
 
@@ -164,51 +172,119 @@ def generate_final_document(outline: DocumentOutline) -> FinalDocument:
     logger.info(f"Final document generated with title: '{result.title}'")
     return result
 
+async def agenerate_final_document(async_client: AsyncOpenAI, outline: DocumentOutline) -> FinalDocument:
+    """
+    Third LLM call on the async client, so that it can be cancelled mid-request
+
+    :param async_client: Client bound to the running event loop
+    :type async_client: AsyncOpenAI
+    :param outline: Outline that is still being validated
+    :type outline: DocumentOutline
+    :return: The final document
+    :rtype: FinalDocument
+    """
+    logger.info("Speculatively generating final document from outline")
+
+    completion = await async_client.beta.chat.completions.parse(
+        model=model,
+        messages=final_document_messages(outline),
+        response_format=FinalDocument,
+    )
+
+    result = completion.choices[0].message.parsed
+    logger.info(f"Final document generated with title: '{result.title}'")
+    return result
+
+def passes_gate(validation_result: OutlineValidation) -> bool:
+    """Gate check: the outline is valid with sufficient confidence"""
+    return validation_result.is_valid and validation_result.confidence_score >= 0.8
+
+async def validate_while_generating(outline: DocumentOutline) -> Tuple[OutlineValidation, Optional[FinalDocument]]:
+    """
+    Validates the outline while the final document is already being generated
+
+    :param outline: Outline to validate and expand
+    :type outline: DocumentOutline
+    :return: The validation result, and the final document if the gate passed
+    :rtype: Tuple[OutlineValidation, FinalDocument | None]
+    """
+    # the async client is bound to this event loop, so it lives no longer than the call
+    async with AsyncOpenAI(api_key=("{{OPENAPI_API_KEY}}")) as async_client:
+        document_task = asyncio.create_task(agenerate_final_document(async_client, outline))
+        try:
+            validation_result = await asyncio.to_thread(validate_document_outline, outline)
+            if not passes_gate(validation_result):
+                return validation_result, None
+            return validation_result, await document_task
+        finally:
+            # cancelling the task aborts its http request, so a rejected outline stops being expanded
+            document_task.cancel()
+
 # orchestrate the entire prompt chain
-def create_document_from_topic(topic:str) -> Optional[FinalDocument]:
+def create_document_from_topic(topic:str, speculative: bool = False) -> Optional[FinalDocument]:
     """
     Main function implementing the prompt chain with a vliadation gate
+
+    In speculative mode the final document, which only needs the outline, is generated
+    concurrently with the outline validation. On the success path that saves one LLM
+    round trip; when the gate fails, the document request is cancelled mid-flight. The
+    tokens generated up to that point are still billed.
     
     :param topic: Description
     :type topic: str
+    :param speculative: Generate the final document while the outline is being validated
+    :type speculative: bool
     :return: Description
     :rtype: FinalDocument | None
     """
     logger.info(f"Starting document creation process for topic: '{topic}'")
+    start = time.perf_counter()
 
     # first llm call: generate the outline
     document_outline = generate_document_outline(topic)
 
-    # second llm call: validate the outline
-    validation_result = validate_document_outline(document_outline)
+    # second llm call: validate the outline, in speculative mode the third one starts right away
+    if speculative:
+        validation_result, final_document = asyncio.run(validate_while_generating(document_outline))
+    else:
+        validation_result = validate_document_outline(document_outline)
 
     # gate check: verify if the outline is valid with sufficient confidence
-    if not validation_result.is_valid or validation_result.confidence_score < 0.8:
+    if not passes_gate(validation_result):
         logger.warning(
             f"Gate check failed - outline not valid or confidence too low ({validation_result.confidence_score:.2f})"
         )
         logger.warning(f"Reasoning: {validation_result.reasoning}")
-    
-    logger.info("Gate check passed, proceeding with final document generation")
+        if speculative:
+            logger.info("Cancelled the speculative final document generation")
+        return None
 
+    logger.info("Gate check passed, proceeding with final document generation")
 
     # third llm calll: Generate the full document 
-    final_document = generate_final_document(document_outline)
+    if not speculative:
+        final_document = generate_final_document(document_outline)
 
-    logger.info("Document creation process completed successfully")
+    logger.info(f"Document creation process completed successfully in {time.perf_counter() - start:.1f}s")
 
     return final_document
 
 
-topic_input = "The benefits of remote work for small businesses"
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prompt chaining with a validation gate")
+    parser.add_argument("--speculative", action="store_true",
+                        help="Generate the final document while the outline is being validated")
+    args = parser.parse_args()
+
+    topic_input = "The benefits of remote work for small businesses"
 
-final_document_result = create_document_from_topic(topic_input)
+    final_document_result = create_document_from_topic(topic_input, speculative=args.speculative)
 
-if final_document_result:
-    print(f"\nTitle: {final_document_result.title}")
-    print("\n----Document content-----")
+    if final_document_result:
+        print(f"\nTitle: {final_document_result.title}")
+        print("\n----Document content-----")
 
-    # printing only the first 500 characters for brevity
-    print(final_document_result.full_content[:500] + "...")
-else:
-    print("Failed to generate a valid document for the topic")
\ No newline at end of file
+        # printing only the first 500 characters for brevity
+        print(final_document_result.full_content[:500] + "...")
+    else:
+        print("Failed to generate a valid document for the topic")